@@ -0,0 +1,198 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import deque
+
+from pipeline import run_pipeline, PIPELINE_MODE, PIPELINE_MODES
+from tracing import span
+
+DEFAULT_WORKERS = 32
+# Ordered mode: lines read but not yet written, as a multiple of the workers.
+ORDERED_WINDOW_FACTOR = 4
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of `values` (pct in 0-100); 0.0 for no values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def load_checkpoint(output_path):
+    """Line numbers already present in an existing output file."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path) as f:
+        for line in f:
+            try:
+                done.add(json.loads(line)["line"])
+            except (ValueError, KeyError):
+                # A record cut short by a crash; it will be re-run.
+                continue
+    return done
+
+
+def read_messages(input_path, field, done):
+    """
+    Yield (line_number, record_id, message, error) for every record not yet processed.
+
+    A line that is not a JSON object with a string under `field` is yielded
+    with message None and the reason in `error`, so it gets an error record
+    instead of stopping the run.
+    """
+    with open(input_path) as f:
+        for line_number, line in enumerate(f):
+            if line_number in done or not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as exc:
+                yield line_number, line_number, None, f"Invalid JSON: {exc}"
+                continue
+            if not isinstance(record, dict) or not isinstance(record.get(field), str):
+                yield line_number, line_number, None, f"No string {field!r} field"
+                continue
+            yield line_number, record.get("id", line_number), record[field], None
+
+
+async def run_batch(input_path, output_path, field="message", workers=DEFAULT_WORKERS,
+                    ordered=True, resume=False, speculative=False, fast_path=True, mode=None) -> dict:
+    """
+    Stream a JSONL file of user messages through the pipeline.
+
+    A fixed pool of `workers` tasks pulls messages from a bounded queue, so
+    memory stays flat no matter how large the input is; in ordered mode
+    reading also pauses while `workers * ORDERED_WINDOW_FACTOR` lines are
+    waiting to be written behind a slow earlier one. Malformed input lines
+    get an error record and the run carries on. Each result is
+    appended to `output_path` as one JSON line tagged with its input line
+    number, and flushed immediately; that file is also the checkpoint, so
+    with resume=True lines already in it are skipped. With ordered=True
+    results are written in input order, otherwise as they complete.
+
+    Returns:
+        Summary dict with counts per status, throughput and per-stage latency percentiles.
+    """
+    done = load_checkpoint(output_path) if resume else set()
+    queue = asyncio.Queue(maxsize=workers * 2)
+    pending = {}          # line_number -> record, waiting for earlier lines (ordered mode)
+    expected = deque()    # line numbers read but not yet written, in input order (ordered mode)
+    window = workers * ORDERED_WINDOW_FACTOR
+    room = asyncio.Event()  # set when `expected` drops below the window
+    stage_latencies = {}
+    statuses = {}
+    processed = 0
+    start = time.perf_counter()
+
+    out = open(output_path, "a" if resume else "w")
+    if resume and out.tell() > 0:
+        with open(output_path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                # Terminate a record cut short by a crash so the next one starts on its own line.
+                out.write("\n")
+
+    def write(record):
+        out.write(json.dumps(record) + "\n")
+        out.flush()
+
+    def flush_in_order():
+        while expected and expected[0] in pending:
+            write(pending.pop(expected.popleft()))
+        if len(expected) < window:
+            room.set()
+
+    async def produce():
+        for item in read_messages(input_path, field, done):
+            if ordered:
+                while len(expected) >= window:
+                    room.clear()
+                    await room.wait()
+                expected.append(item[0])
+            await queue.put((*item, time.perf_counter()))
+        for _ in range(workers):
+            await queue.put(None)
+
+    async def work():
+        nonlocal processed
+        while (item := await queue.get()) is not None:
+            line_number, record_id, message, error, enqueued = item
+            try:
+                if error is not None:
+                    raise ValueError(error)
+                with span("request", line=line_number, queue_time=time.perf_counter() - enqueued):
+                    outcome = await run_pipeline(message, speculative=speculative, fast_path=fast_path, mode=mode)
+            except Exception as exc:
+                outcome = {"status": "error", "error": f"{type(exc).__name__}: {exc}", "final_message": None, "timings": {}}
+
+            for stage, seconds in outcome.get("timings", {}).items():
+                stage_latencies.setdefault(stage, []).append(seconds)
+            statuses[outcome["status"]] = statuses.get(outcome["status"], 0) + 1
+            processed += 1
+
+            record = {"line": line_number, "id": record_id, "message": message, **outcome}
+            if ordered:
+                pending[line_number] = record
+                flush_in_order()
+            else:
+                write(record)
+
+    try:
+        await asyncio.gather(produce(), *(work() for _ in range(workers)))
+    finally:
+        out.close()
+
+    elapsed = time.perf_counter() - start
+    return {
+        "processed": processed,
+        "skipped": len(done),
+        "statuses": statuses,
+        "elapsed_seconds": elapsed,
+        "throughput_per_second": processed / elapsed if elapsed else 0.0,
+        "stages": {
+            stage: {
+                "count": len(values),
+                "mean": sum(values) / len(values),
+                "p50": percentile(values, 50),
+                "p95": percentile(values, 95),
+                "p99": percentile(values, 99),
+            }
+            for stage, values in stage_latencies.items()
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a JSONL file of user messages through the event pipeline.")
+    parser.add_argument("input", help="JSONL file, one object per line with the message under --field")
+    parser.add_argument("output", help="JSONL results file (also used as the resume checkpoint)")
+    parser.add_argument("--field", default="message", help="Key holding the user message (default: message)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Concurrent pipeline runs")
+    parser.add_argument("--unordered", action="store_true", help="Write results as they complete")
+    parser.add_argument("--resume", action="store_true", help="Skip lines already present in the output file")
+    parser.add_argument("--speculative", action="store_true", help="Validate and categorize in parallel")
+    parser.add_argument("--no-fast-path", action="store_true", help="Always use the model validator/categorizer")
+    parser.add_argument("--mode", choices=PIPELINE_MODES, default=PIPELINE_MODE, help="chained or fused stages")
+    args = parser.parse_args()
+
+    summary = asyncio.run(run_batch(
+        args.input,
+        args.output,
+        field=args.field,
+        workers=args.workers,
+        ordered=not args.unordered,
+        resume=args.resume,
+        speculative=args.speculative,
+        fast_path=not args.no_fast_path,
+        mode=args.mode,
+    ))
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Import-time budget check for the CLI.
+
+Runs `python -X importtime -c "import main"` from agent-architecture a few
+times and fails (exit 1) when the best cumulative import time of `main`
+exceeds the budget, or when a module that should load lazily (the openai
+SDK, httpx, dotenv) is imported at startup.
+
+    python bench/check_import_time.py --budget-ms 150
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_BUDGET_MS = 150.0
+DEFAULT_RUNS = 5
+
+# Only needed once a request actually goes to the API.
+LAZY_MODULES = ("openai", "httpx", "dotenv")
+
+
+def measure(module: str = "main") -> tuple[float, set]:
+    """One cold import of `module`: (cumulative milliseconds, top-level packages imported)."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    total_us = None
+    packages = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _self, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        if not cumulative.isdigit():
+            continue  # the header line
+        packages.add(name.split(".")[0])
+        if name == module:
+            total_us = int(cumulative)
+    return total_us / 1000, packages
+
+
+def check(budget_ms: float, runs: int) -> list[str]:
+    samples = [measure() for _ in range(runs)]
+    best_ms = min(ms for ms, _ in samples)
+    print(f"import main: best of {runs} = {best_ms:.1f}ms (budget {budget_ms:.0f}ms)")
+
+    failures = []
+    if best_ms > budget_ms:
+        failures.append(f"import main took {best_ms:.1f}ms, over the {budget_ms:.0f}ms budget")
+    eager = sorted(set(LAZY_MODULES) & samples[0][1])
+    if eager:
+        failures.append(f"imported at startup but should be lazy: {', '.join(eager)}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail when CLI import time regresses.")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS, help="Take the best of this many cold imports")
+    args = parser.parse_args()
+
+    failures = check(args.budget_ms, args.runs)
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""
+Offline benchmark for the event pipeline.
+
+Starts bench/stub_server.py, points the OpenAI SDK at it and runs
+main.py-style pipelines at several concurrency levels, store sizes and
+execution modes (sequential, speculative and fused), reporting p50/p95/p99
+latency, requests/sec, model calls/tokens and cost per request. With
+--baseline, exits non-zero when any scenario's p95 regresses by more than
+--tolerance, so it can gate CI.
+
+    python bench/run_bench.py --requests 200 --concurrency 1 10 50 --store-sizes 100 10000
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+AGENT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(AGENT_DIR))
+
+MESSAGES = [
+    "register me for AI Conference, bench@example.com",
+    "list events",
+    "Who is attending the Developer Meetup?",
+    "Can you tell me something about what's going on?",
+    "I'd like to join the meetup as Sam, sam@example.com",
+    "How many people signed up overall?",
+]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_stub(latency, jitter, model_latency):
+    port = _free_port()
+    cmd = [sys.executable, str(AGENT_DIR / "bench" / "stub_server.py"), "--port", str(port),
+           "--latency", str(latency), "--jitter", str(jitter)]
+    for override in model_latency or []:
+        cmd += ["--model-latency", override]
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL)
+
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(url, timeout=0.5)
+            return proc, f"{url}/v1"
+        except OSError:
+            time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError("Stub server did not start")
+
+
+# Bench mode -> (pipeline mode, speculative)
+MODES = {
+    "sequential": ("chained", False),
+    "speculative": ("chained", True),
+    "fused": ("fused", False),
+}
+
+
+class TokenTally:
+    """Tracing exporter that sums uncached model calls and tokens over finished traces."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+    def export(self, trace: dict):
+        for s in trace["spans"]:
+            # Calls stopped by the cost budget carry an error and were never sent.
+            if s["name"] == "llm.responses.create" and not s["attributes"].get("cache_hit") \
+                    and "error" not in s["attributes"]:
+                self.calls += 1
+                self.input_tokens += s["attributes"].get("input_tokens", 0)
+                self.output_tokens += s["attributes"].get("output_tokens", 0)
+
+
+def seed_store(store, size: int):
+    """Grow the attendee table to `size` rows, spread over the known events."""
+    events = [e["name"] for e in store.events]
+    for i in range(store.count_attendees(), size):
+        store.add_attendee(events[i % len(events)], f"Seed Person {i}", f"seed{i}@example.com")
+
+
+async def run_scenario(run_pipeline, requests, concurrency, mode, speculative, fast_path) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def _one(i):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await run_pipeline(MESSAGES[i % len(MESSAGES)], speculative=speculative, fast_path=fast_path, mode=mode)
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(_one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    return latencies, errors, elapsed
+
+
+async def run_matrix(args) -> list[dict]:
+    # Imported here so the SDK picks up the stub's OPENAI_BASE_URL. All
+    # scenarios share one event loop, as the async client's pool is bound to it.
+    from batch import percentile
+    from pipeline import run_pipeline
+    from tools.mock_db import store
+    import tracing
+
+    from cost_ledger import ledger
+    from client_manager import clients
+    clients.async_client  # the SDK loads lazily; keep that out of the first scenario
+
+    tally = TokenTally()
+    tracing.exporters.append(tally)
+
+    results = []
+    for size in sorted(args.store_sizes):
+        seed_store(store, size)
+        for bench_mode in args.modes:
+            mode, speculative = MODES[bench_mode]
+            for concurrency in args.concurrency:
+                tally.reset()
+                spent_before = ledger.totals["cost_usd"]
+                latencies, errors, elapsed = await run_scenario(
+                    run_pipeline, args.requests, concurrency, mode, speculative, not args.no_fast_path
+                )
+                result = {
+                    "scenario": f"{bench_mode}/c{concurrency}/n{size}",
+                    "p50": percentile(latencies, 50),
+                    "p95": percentile(latencies, 95),
+                    "p99": percentile(latencies, 99),
+                    "requests_per_second": len(latencies) / elapsed,
+                    "llm_calls_per_request": tally.calls / len(latencies),
+                    "input_tokens_per_request": tally.input_tokens / len(latencies),
+                    "output_tokens_per_request": tally.output_tokens / len(latencies),
+                    "cost_per_request_usd": (ledger.totals["cost_usd"] - spent_before) / len(latencies),
+                    "errors": errors,
+                }
+                results.append(result)
+                print(f"{result['scenario']:<28} p50={result['p50'] * 1000:8.1f}ms "
+                      f"p95={result['p95'] * 1000:8.1f}ms p99={result['p99'] * 1000:8.1f}ms "
+                      f"rps={result['requests_per_second']:8.1f} calls={result['llm_calls_per_request']:.2f} "
+                      f"tokens={result['input_tokens_per_request']:.0f}+{result['output_tokens_per_request']:.0f} "
+                      f"cost=${result['cost_per_request_usd'] * 1000:.3f}/1k "
+                      f"errors={errors}")
+
+    from llm_client import cached_token_ratios
+    print("cached-token ratio per stage: " + ", ".join(
+        f"{stage}={ratio:.0%}" for stage, ratio in sorted(cached_token_ratios().items())
+    ))
+    import schemas
+    print("schema validation per stage: " + ", ".join(
+        f"{name}={c['seconds'] / c['validated'] * 1e6:.1f}us failures={c['failures']} repaired={c['repaired']}"
+        for name, c in sorted(schemas.stats.items()) if c["validated"]
+    ))
+    from stages import input_validator
+    if input_validator.cascade_stats["requests"]:
+        print(f"validator cascade: escalation={input_validator.escalation_rate():.0%} "
+              f"agreement={input_validator.agreement_rate():.0%} ({input_validator.cascade_stats})")
+    print("rate-limit queueing per model: " + ", ".join(
+        f"{model}: max_depth={s['max_queue_depth']} waits={s['waits']} mean_wait={s['mean_wait'] * 1000:.1f}ms"
+        for model, s in sorted(clients.queue_stats().items()) if s["calls"]
+    ))
+    report = ledger.report()
+    print("cost per stage: " + ", ".join(
+        f"{stage}=${t['cost_usd']:.4f} ({t['calls']} calls)" for stage, t in sorted(report["by_stage"].items())
+    ))
+    print("cost per category: " + ", ".join(
+        f"{category}=${t['cost_usd']:.4f}" for category, t in sorted(report["by_category"].items())
+    ) + f"; degraded requests: {report['degraded_requests']}")
+    if args.cost_export:
+        if args.cost_export.endswith(".csv"):
+            ledger.export_csv(args.cost_export)
+        else:
+            ledger.export_json(args.cost_export)
+    return results
+
+
+def check_regressions(results, baseline_path, tolerance) -> list[str]:
+    with open(baseline_path) as f:
+        baseline = {r["scenario"]: r for r in json.load(f)["results"]}
+    failures = []
+    for result in results:
+        before = baseline.get(result["scenario"])
+        if before and result["p95"] > before["p95"] * (1 + tolerance):
+            failures.append(f"{result['scenario']}: p95 {result['p95']:.4f}s vs baseline {before['p95']:.4f}s")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline pipeline benchmark against a stub Responses API.")
+    parser.add_argument("--requests", type=int, default=200, help="Pipeline runs per scenario")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--store-sizes", type=int, nargs="+", default=[100, 10_000])
+    parser.add_argument("--modes", nargs="+", default=["sequential", "speculative", "fused"],
+                        choices=list(MODES))
+    parser.add_argument("--no-fast-path", action="store_true", help="Send every message through the models")
+    parser.add_argument("--cache", action="store_true", help="Keep the response cache enabled")
+    parser.add_argument("--latency", type=float, default=0.05, help="Stub latency per call in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--model-latency", action="append", metavar="MODEL=SECONDS")
+    parser.add_argument("--rate-limits", metavar="SPEC",
+                        help="LLM_RATE_LIMITS to apply, e.g. gpt-4o=500:30000 (default: effectively unlimited)")
+    parser.add_argument("--budget", type=float, metavar="USD", help="Per-request cost budget (REQUEST_BUDGET_USD)")
+    parser.add_argument("--cost-export", metavar="PATH", help="Write the cost ledger to PATH (.csv, else JSON)")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--baseline", help="Previous --output file to compare p95 against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed p95 regression (fraction)")
+    args = parser.parse_args()
+
+    proc, base_url = start_stub(args.latency, args.jitter, args.model_latency)
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ["OPENAI_API_KEY"] = "stub"
+    if not args.cache:
+        os.environ["LLM_CACHE_ENABLED"] = "0"
+    if args.budget is not None:
+        os.environ["REQUEST_BUDGET_USD"] = str(args.budget)
+    # Measure the pipeline, not the client-side limiter, unless asked to.
+    os.environ["LLM_RATE_LIMITS"] = args.rate_limits or ",".join(
+        f"{model}=1e9:1e12" for model in ("gpt-4o", "gpt-4o-mini", "gpt-4.1")
+    )
+
+    try:
+        results = asyncio.run(run_matrix(args))
+    finally:
+        proc.terminate()
+
+    # The counters behind count/overview queries must match a full recount.
+    from tools.mock_db import check_attendee_counts, store
+    mismatches = check_attendee_counts(store)
+    for mismatch in mismatches:
+        print(f"FAIL attendee counts: {mismatch}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"stub_latency": args.latency, "results": results}, f, indent=2)
+
+    if args.baseline:
+        failures = check_regressions(results, args.baseline, args.tolerance)
+        for failure in failures:
+            print(f"REGRESSION {failure}")
+        if failures:
+            sys.exit(1)
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Insert and query throughput of the event store backends.
+
+For each backend, registers --attendees attendees across --events events,
+then runs --queries lookups of each kind the pipeline issues (list an
+event's attendees, exact email lookup, name search, events context,
+per-event counts) and removes a tenth of the attendees. Exits non-zero if
+the maintained attendee counters disagree with a full recount afterwards.
+
+    python bench/store_bench.py --attendees 50000 --queries 2000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.mock_db import EventStore, check_attendee_counts  # noqa: E402
+from tools.sqlite_store import SqliteEventStore  # noqa: E402
+
+
+def make_store(backend: str, directory: str, batch_size: int):
+    if backend == "memory":
+        return EventStore()
+    return SqliteEventStore(os.path.join(directory, f"{backend}.db"), batch_size=batch_size)
+
+
+def bench_backend(store, events: int, attendees: int, queries: int) -> dict:
+    names = [f"Event {i}" for i in range(events)]
+    for name in names:
+        store.add_event(name)
+
+    start = time.perf_counter()
+    for i in range(attendees):
+        store.add_attendee(names[i % events], f"Person {i}", f"person{i}@example.com")
+    store.flush()
+    insert_seconds = time.perf_counter() - start
+
+    rng = random.Random(0)
+    lookups = {
+        "list_attendees": lambda: store.list_attendees(rng.choice(names)),
+        "find_by_email": lambda: store.find_by_email(f"person{rng.randrange(attendees)}@example.com"),
+        "search_name": lambda: store.search_attendees("name", f"son {rng.randrange(attendees)}", 50),
+        "events_context": store.events_context,
+        "attendee_counts": store.attendee_counts,
+    }
+    result = {"inserts_per_second": attendees / insert_seconds}
+    for kind, lookup in lookups.items():
+        start = time.perf_counter()
+        for _ in range(queries):
+            lookup()
+        result[f"{kind}_per_second"] = queries / (time.perf_counter() - start)
+
+    removals = rng.sample(range(1, attendees + 1), attendees // 10)
+    start = time.perf_counter()
+    for attendee_id in removals:
+        store.remove_attendee(attendee_id)
+    store.flush()
+    result["removals_per_second"] = len(removals) / (time.perf_counter() - start)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare event store backends.")
+    parser.add_argument("--events", type=int, default=20)
+    parser.add_argument("--attendees", type=int, default=20_000)
+    parser.add_argument("--queries", type=int, default=2_000, help="Lookups per query kind")
+    parser.add_argument("--batch-size", type=int, default=32, help="SQLite writes per commit")
+    args = parser.parse_args()
+
+    failed = False
+    with tempfile.TemporaryDirectory() as directory:
+        for backend in ("memory", "sqlite"):
+            store = make_store(backend, directory, args.batch_size)
+            result = bench_backend(store, args.events, args.attendees, args.queries)
+            mismatches = check_attendee_counts(store)
+            if backend == "sqlite":
+                store.close()
+            print(f"{backend:<8} " + " ".join(f"{k.removesuffix('_per_second')}={v:,.0f}/s" for k, v in result.items()))
+            for mismatch in mismatches:
+                print(f"FAIL {backend} attendee counts: {mismatch}")
+            failed = failed or bool(mismatches)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+Local stand-in for the OpenAI Responses API, for offline benchmarks.
+
+Serves POST /v1/responses with schema-valid canned outputs chosen by the
+request's json_schema name, after an injected delay. Requests with
+"stream": true get server-sent events with one delta per word. Point the SDK at it with
+OPENAI_BASE_URL=http://127.0.0.1:<port>/v1.
+
+    python bench/stub_server.py --port 8765 --latency 0.2 --model-latency gpt-4o=0.4
+"""
+import argparse
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CANNED_OUTPUTS = {
+    "validation_response": {"valid": True, "reason": "Relevant to event management."},
+    "validation_confidence_response": {"valid": True, "reason": "Relevant to event management.", "confidence": 0.9},
+    "categorization_response": {"category": "info_request", "confidence": 0.95},
+    "registration_extraction": {"event_name": "AI Conference", "name": "Bench User", "email": "bench@example.com"},
+    "bulk_registration_extraction": {"registrations": [
+        {"event_name": "AI Conference", "name": "Bench User", "email": "bench@example.com"},
+        {"event_name": "AI Conference", "name": "Bench Colleague", "email": "colleague@example.com"},
+    ]},
+    "info_request_extraction": {
+        "query_type": "count_attendees",
+        "events_mentioned": [],
+        "attendee_name": "",
+        "attendee_email": "",
+        "wants_count": True,
+    },
+}
+CANNED_OUTPUTS["router_response"] = {
+    "valid": True,
+    "reason": "Relevant to event management.",
+    "category": "info_request",
+    "confidence": 0.95,
+    "details": {"kind": "info_request", **CANNED_OUTPUTS["info_request_extraction"]},
+}
+COMPOSED_TEXT = "Here is the information you asked for about our events."
+
+
+def example_for_schema(schema: dict):
+    """Build a minimal value that satisfies `schema` (used for unknown schema names)."""
+    if "anyOf" in schema:
+        return example_for_schema(schema["anyOf"][0])
+    if "enum" in schema:
+        return schema["enum"][0]
+    kind = schema.get("type")
+    if isinstance(kind, list):
+        kind = kind[0]
+    if kind == "object":
+        return {name: example_for_schema(prop) for name, prop in schema.get("properties", {}).items()}
+    if kind == "array":
+        return [example_for_schema(schema["items"])] if schema.get("minItems") else []
+    if kind == "boolean":
+        return True
+    if kind in ("number", "integer"):
+        return 1
+    if kind == "null":
+        return None
+    return "stub"
+
+
+def output_for_request(body: dict) -> str:
+    fmt = (body.get("text") or {}).get("format") or {}
+    if fmt.get("type") != "json_schema":
+        return COMPOSED_TEXT
+    if fmt.get("name") in CANNED_OUTPUTS:
+        return json.dumps(CANNED_OUTPUTS[fmt["name"]])
+    return json.dumps(example_for_schema(fmt.get("schema", {})))
+
+
+def response_payload(body: dict, text: str) -> dict:
+    input_tokens = max(1, len(json.dumps(body.get("input", ""))) // 4)
+    output_tokens = max(1, len(text) // 4)
+    return {
+        "id": f"resp_stub_{random.getrandbits(48):x}",
+        "object": "response",
+        "created_at": int(time.time()),
+        "status": "completed",
+        "model": body.get("model", "stub"),
+        "output": [{
+            "type": "message",
+            "id": "msg_stub",
+            "status": "completed",
+            "role": "assistant",
+            "content": [{"type": "output_text", "text": text, "annotations": []}],
+        }],
+        "parallel_tool_calls": True,
+        "tool_choice": "auto",
+        "tools": [],
+        "usage": {
+            "input_tokens": input_tokens,
+            "input_tokens_details": {"cached_tokens": 0},
+            "output_tokens": output_tokens,
+            "output_tokens_details": {"reasoning_tokens": 0},
+            "total_tokens": input_tokens + output_tokens,
+        },
+    }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # avoid ~40ms delayed-ACK stalls on keep-alive connections
+    latency = 0.0
+    jitter = 0.0
+    model_latency = {}
+    chunk_delay = 0.0
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if not self.path.rstrip("/").endswith("/responses"):
+            self._send_json(404, {"error": {"message": f"No stub for {self.path}"}})
+            return
+
+        delay = self.model_latency.get(body.get("model"), self.latency)
+        time.sleep(max(0.0, delay + random.uniform(-self.jitter, self.jitter)))
+        text = output_for_request(body)
+        if body.get("stream"):
+            self._send_stream(body, text)
+        else:
+            self._send_json(200, response_payload(body, text))
+
+    def do_GET(self):
+        self._send_json(200, {"status": "ok"})
+
+    def _send_stream(self, body: dict, text: str):
+        # Server-sent events, one output_text delta per word, then response.completed.
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        payload = response_payload(body, text)
+        events = [{"type": "response.created", "response": {**payload, "status": "in_progress", "output": []}}]
+        for i, word in enumerate(text.split(" ")):
+            events.append({
+                "type": "response.output_text.delta",
+                "item_id": "msg_stub",
+                "output_index": 0,
+                "content_index": 0,
+                "delta": word if i == 0 else " " + word,
+                "logprobs": [],
+            })
+        events.append({"type": "response.completed", "response": payload})
+
+        for sequence_number, event in enumerate(events):
+            event["sequence_number"] = sequence_number
+            self.wfile.write(f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode())
+            self.wfile.flush()
+            if event["type"] == "response.output_text.delta":
+                time.sleep(self.chunk_delay)
+
+    def _send_json(self, status: int, payload: dict):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 512  # socketserver's default of 5 drops bursts of new connections
+
+
+def make_server(port=0, latency=0.0, jitter=0.0, model_latency=None, chunk_delay=0.0) -> ThreadingHTTPServer:
+    handler = type("ConfiguredStubHandler", (StubHandler,), {
+        "latency": latency,
+        "jitter": jitter,
+        "model_latency": dict(model_latency or {}),
+        "chunk_delay": chunk_delay,
+    })
+    return StubServer(("127.0.0.1", port), handler)
+
+
+def parse_model_latency(values) -> dict:
+    """Turn ["gpt-4o=0.4", ...] into {"gpt-4o": 0.4, ...}."""
+    return {model: float(seconds) for model, seconds in (v.split("=", 1) for v in values or [])}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Uniform +/- seconds of noise")
+    parser.add_argument("--model-latency", action="append", metavar="MODEL=SECONDS",
+                        help="Per-model latency override (repeatable)")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="Seconds between streamed deltas")
+    args = parser.parse_args()
+
+    server = make_server(args.port, args.latency, args.jitter, parse_model_latency(args.model_latency),
+                         args.chunk_delay)
+    print(f"Stub Responses API on http://127.0.0.1:{server.server_address[1]}/v1", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
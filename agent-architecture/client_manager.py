@@ -0,0 +1,309 @@
+"""
+Shared OpenAI clients with connection pooling and per-model rate limits.
+
+One ClientManager owns a sync and an async client, each on an explicitly
+sized keep-alive connection pool, and puts every call behind per-model
+token buckets for requests/min and tokens/min. A call that would exceed
+its model's budget reserves its place and waits, so bursts queue up in
+arrival order instead of coming back as 429s.
+
+Limits default to DEFAULT_LIMITS and can be overridden with
+LLM_RATE_LIMITS="gpt-4o=500:30000,gpt-4o-mini=5000:2000000" (requests per
+minute : tokens per minute). Pool sizes come from LLM_MAX_CONNECTIONS,
+LLM_MAX_KEEPALIVE and LLM_KEEPALIVE_EXPIRY.
+
+Nothing heavy happens at import: .env is loaded, the settings are read and
+the openai SDK is imported on first real use, so CLI runs served
+from caches or the local fast path never pay for the SDK.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+
+# model -> (requests per minute, tokens per minute)
+DEFAULT_LIMITS = {
+    "gpt-4o": (500, 30_000),
+    "gpt-4o-mini": (500, 200_000),
+    "gpt-4.1": (500, 30_000),
+}
+
+# Output tokens assumed for a request without max_output_tokens; corrected
+# from the reported usage once the response arrives.
+DEFAULT_OUTPUT_ESTIMATE = 256
+
+
+class TokenBucket:
+    """
+    A bucket of `per_minute` units, refilled continuously.
+
+    `reserve` always succeeds: it takes the units now, letting the level go
+    negative, and returns how long the caller must wait for the refill to
+    cover them. Later callers queue behind the debt, so waiters are served
+    in arrival order.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        self._refill(now)
+        self.level -= amount
+        return max(0.0, -self.level / self.rate)
+
+    def refund(self, amount: float, now: float):
+        self._refill(now)
+        self.level = min(self.capacity, self.level + amount)
+
+
+class ModelLimiter:
+    """Request and token buckets for one model, plus queue statistics."""
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "queued": 0, "max_queue_depth": 0, "waits": 0, "wait_seconds": 0.0, "max_wait": 0.0}
+
+    def reserve(self, tokens: int) -> float:
+        """Take one request and `tokens` tokens; returns the seconds to wait first."""
+        with self._lock:
+            now = time.monotonic()
+            delay = max(self.requests.reserve(1, now), self.tokens.reserve(tokens, now))
+            self.stats["calls"] += 1
+            if delay > 0:
+                self.stats["queued"] += 1
+                self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], self.stats["queued"])
+            return delay
+
+    def done_waiting(self, delay: float):
+        with self._lock:
+            self.stats["queued"] -= 1
+            self.stats["waits"] += 1
+            self.stats["wait_seconds"] += delay
+            self.stats["max_wait"] = max(self.stats["max_wait"], delay)
+
+    def release(self, tokens: int):
+        """Give back a reservation whose call was never sent."""
+        with self._lock:
+            now = time.monotonic()
+            self.requests.refund(1, now)
+            self.tokens.refund(tokens, now)
+
+    def settle(self, estimated: int, actual: int):
+        """Give back (or take) the difference between estimated and reported tokens."""
+        with self._lock:
+            self.tokens.refund(estimated - actual, time.monotonic())
+
+
+def parse_limits(spec: str) -> dict:
+    """Parse LLM_RATE_LIMITS ("model=rpm:tpm,...") into DEFAULT_LIMITS form."""
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        model, _, values = item.partition("=")
+        rpm, _, tpm = values.partition(":")
+        limits[model.strip()] = (float(rpm), float(tpm))
+    return limits
+
+
+def estimate_tokens(request: dict) -> int:
+    """Rough token cost of a Responses API request: ~4 characters per input token."""
+    prompt = request.get("input", "")
+    if not isinstance(prompt, str):
+        prompt = json.dumps(prompt)
+    instructions = request.get("instructions") or ""
+    output = request.get("max_output_tokens") or DEFAULT_OUTPUT_ESTIMATE
+    return (len(prompt) + len(instructions)) // 4 + output
+
+
+def _used_tokens(usage) -> int:
+    return usage.input_tokens + usage.output_tokens
+
+
+_env_loaded = False
+
+
+def load_env():
+    """Load .env once, on first use rather than at import."""
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _env_loaded = True
+
+
+class ClientManager:
+    """
+    Pooled OpenAI clients with per-model rate limiting.
+
+    Settings left as None are read from the environment (after .env is
+    loaded) the first time the manager is used.
+    """
+
+    def __init__(self, limits: dict = None, max_connections=None, max_keepalive=None, keepalive_expiry=None,
+                 timeout=60.0, max_retries=2):
+        self._limits = limits
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.keepalive_expiry = keepalive_expiry
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self._limiters = None
+        self._client = None
+        self._async_client = None
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_env(cls):
+        return cls()
+
+    @property
+    def limiters(self) -> dict:
+        if self._limiters is None:
+            with self._lock:
+                if self._limiters is None:
+                    self._configure()
+        return self._limiters
+
+    def _configure(self):
+        load_env()
+        limits = self._limits
+        if limits is None:
+            limits = dict(DEFAULT_LIMITS)
+            limits.update(parse_limits(os.getenv("LLM_RATE_LIMITS", "")))
+        if self.max_connections is None:
+            self.max_connections = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+        if self.max_keepalive is None:
+            self.max_keepalive = int(os.getenv("LLM_MAX_KEEPALIVE", "20"))
+        if self.keepalive_expiry is None:
+            self.keepalive_expiry = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "30"))
+        self._limiters = {model: ModelLimiter(*values) for model, values in limits.items()}
+
+    def _pool_limits(self):
+        import openai
+        self.limiters  # make sure the pool settings are resolved
+        # The Limits class of whichever HTTP library this openai version ships on.
+        return type(openai.DEFAULT_CONNECTION_LIMITS)(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from openai import OpenAI, DefaultHttpxClient
+                    self._client = OpenAI(
+                        api_key=os.getenv("OPENAI_API_KEY"),
+                        max_retries=self.max_retries,
+                        http_client=DefaultHttpxClient(limits=self._pool_limits(), timeout=self.timeout),
+                    )
+        return self._client
+
+    @property
+    def async_client(self):
+        if self._async_client is None:
+            with self._lock:
+                if self._async_client is None:
+                    from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+                    self._async_client = AsyncOpenAI(
+                        api_key=os.getenv("OPENAI_API_KEY"),
+                        max_retries=self.max_retries,
+                        http_client=DefaultAsyncHttpxClient(limits=self._pool_limits(), timeout=self.timeout),
+                    )
+        return self._async_client
+
+    def create_response(self, **request):
+        """
+        client.responses.create, after waiting for the model's rate limit.
+
+        The token reservation is corrected from response.usage; streamed
+        responses keep the estimate. A call that fails (or is interrupted)
+        gives its reservation back, so bursts of errors don't starve the
+        calls after them.
+        """
+        limiter = self.limiters.get(request.get("model"))
+        if limiter is None:
+            return self.client.responses.create(**request)
+        estimated = estimate_tokens(request)
+        delay = limiter.reserve(estimated)
+        try:
+            if delay > 0:
+                try:
+                    time.sleep(delay)
+                finally:
+                    limiter.done_waiting(delay)
+            response = self.client.responses.create(**request)
+        except BaseException:
+            limiter.release(estimated)
+            raise
+        if not request.get("stream") and response.usage is not None:
+            limiter.settle(estimated, _used_tokens(response.usage))
+        return response
+
+    async def create_response_async(self, **request):
+        """Async variant of create_response."""
+        limiter = self.limiters.get(request.get("model"))
+        if limiter is None:
+            return await self.async_client.responses.create(**request)
+        estimated = estimate_tokens(request)
+        delay = limiter.reserve(estimated)
+        try:
+            if delay > 0:
+                try:
+                    await asyncio.sleep(delay)
+                finally:
+                    limiter.done_waiting(delay)
+            response = await self.async_client.responses.create(**request)
+        except BaseException:
+            # Including cancellation, while queued or during the HTTP call.
+            limiter.release(estimated)
+            raise
+        if not request.get("stream") and response.usage is not None:
+            limiter.settle(estimated, _used_tokens(response.usage))
+        return response
+
+    async def aclose(self):
+        """Close the async client's connection pool, if it was created."""
+        if self._async_client is not None:
+            await self._async_client.close()
+            self._async_client = None
+
+    def queue_stats(self) -> dict:
+        """Per model: calls, current queue depth, max queue depth, waits and wait times."""
+        stats = {}
+        for model, limiter in self.limiters.items():
+            s = dict(limiter.stats)
+            s["mean_wait"] = s["wait_seconds"] / s["waits"] if s["waits"] else 0.0
+            stats[model] = s
+        return stats
+
+    def rate_limited_client(self):
+        """An object with the `client.responses.create(...)` shape, for scripts."""
+        return _RateLimitedClient(self)
+
+
+class _Responses:
+    def __init__(self, manager: ClientManager):
+        self._manager = manager
+
+    def create(self, **request):
+        return self._manager.create_response(**request)
+
+
+class _RateLimitedClient:
+    def __init__(self, manager: ClientManager):
+        self.responses = _Responses(manager)
+
+
+clients = ClientManager.from_env()
@@ -0,0 +1,158 @@
+"""
+Token-budgeted conversation memory for multi-turn assistants.
+
+Instead of resending the whole history on every turn, ConversationMemory
+keeps the system message and the most recent messages verbatim and, once
+the history goes over its token budget, folds the older messages into a
+running summary. Tool calls are kept as function_call / function_call_output
+item pairs (see tool_engine.py) and never split by a fold. Tool results over
+a size limit are stored on the side and replaced in the history by a short
+reference (with a preview) that can be resolved again with lookup().
+
+Token counts are estimates (about 4 characters per token), the same
+approximation the client manager uses for rate limiting.
+"""
+import json
+
+SUMMARY_INSTRUCTIONS = (
+    "You maintain a running summary of a conversation between a user and an events assistant. "
+    "Merge the new turns into the summary. Keep names, emails, event ids, registrations made and "
+    "open questions; drop pleasantries. Reply with the updated summary only, at most 120 words."
+)
+
+
+def count_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+def message_tokens(message: dict) -> int:
+    content = message.get("content", message)
+    return count_tokens(content if isinstance(content, str) else json.dumps(content)) + 4
+
+
+def _transcript_line(message: dict) -> str:
+    if message.get("type") == "function_call":
+        return f"tool call: {message['name']}({message['arguments']})"
+    if message.get("type") == "function_call_output":
+        return f"tool result: {message['output']}"
+    return f"{message['role']}: {message['content']}"
+
+
+def llm_summarizer(client, model: str = "gpt-4o-mini"):
+    """A summarize(summary, messages) function that asks `model` to merge the turns in."""
+    def summarize(summary: str, messages: list) -> str:
+        transcript = "\n".join(_transcript_line(m) for m in messages)
+        response = client.responses.create(
+            model=model,
+            input=[
+                {"role": "system", "content": SUMMARY_INSTRUCTIONS},
+                {"role": "user", "content": f"Summary so far:\n{summary or '(none)'}\n\nNew turns:\n{transcript}"},
+            ],
+        )
+        return response.output_text.strip()
+    return summarize
+
+
+class ConversationMemory:
+    """
+    Conversation history that stays within `budget_tokens`.
+
+    `summarize(summary, messages) -> str` folds old messages into the
+    summary (see llm_summarizer); it is only called when the history is
+    over budget and at least `fold_batch` messages are older than the
+    `keep_recent` most recent ones, and then folds all of them at once, so
+    summary calls stay infrequent and the sent prefix is stable in between.
+    """
+
+    def __init__(self, system_message: dict, summarize, budget_tokens: int = 2000, keep_recent: int = 6,
+                 max_tool_result_tokens: int = 200, fold_batch: int = 4):
+        self.system_message = system_message
+        self.summarize = summarize
+        self.budget_tokens = budget_tokens
+        self.keep_recent = keep_recent
+        self.max_tool_result_tokens = max_tool_result_tokens
+        self.fold_batch = fold_batch
+        self.summary = ""
+        self.history = []       # messages kept verbatim (or with tool results truncated)
+        self.tool_results = {}  # reference -> full serialized tool result
+        self.full_tokens = message_tokens(system_message)  # what resending everything would cost
+        self.turns = []         # per-turn stats, see record_turn()
+
+    def add(self, message: dict):
+        self.history.append(message)
+        self.full_tokens += message_tokens(message)
+
+    def add_tool_result(self, call: dict, result) -> dict:
+        """
+        Append a function_call item and its output; returns the output item added.
+
+        Results over max_tool_result_tokens are kept in `tool_results` and
+        represented by a reference and a short preview.
+        """
+        serialized = json.dumps(result)
+        output = {"type": "function_call_output", "call_id": call["call_id"], "output": serialized}
+        self.full_tokens += message_tokens(call) + message_tokens(output)
+        self.history.append(call)
+        if count_tokens(serialized) > self.max_tool_result_tokens:
+            reference = f"tool-result-{len(self.tool_results) + 1}"
+            self.tool_results[reference] = serialized
+            preview = serialized[: self.max_tool_result_tokens * 2]
+            output = dict(output, output=(
+                f"[truncated to {reference}, {len(serialized):,} chars; call get_tool_result for the rest] "
+                f"{preview}..."
+            ))
+        self.history.append(output)
+        return output
+
+    def lookup(self, reference: str):
+        """The full tool result stored under `reference`, or None."""
+        serialized = self.tool_results.get(reference)
+        return json.loads(serialized) if serialized is not None else None
+
+    def messages(self) -> list:
+        """The messages to send for the next model call, compacted to the budget first."""
+        self._compact()
+        return self._assemble()
+
+    def sent_tokens(self) -> int:
+        return sum(message_tokens(m) for m in self._assemble())
+
+    def record_turn(self, input_tokens: int = None) -> dict:
+        """
+        Record the cost of the turn just sent.
+
+        Returns:
+            dict with the estimated tokens sent, the tokens the full history
+            would have cost, the saving, and the provider-reported
+            input_tokens when given.
+        """
+        sent = self.sent_tokens()
+        stats = {
+            "turn": len(self.turns) + 1,
+            "sent_tokens": sent,
+            "full_tokens": self.full_tokens,
+            "saved_tokens": max(0, self.full_tokens - sent),
+            "saved_fraction": max(0, self.full_tokens - sent) / self.full_tokens if self.full_tokens else 0.0,
+            "input_tokens": input_tokens,
+        }
+        self.turns.append(stats)
+        return stats
+
+    def _assemble(self) -> list:
+        messages = [self.system_message]
+        if self.summary:
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{self.summary}"})
+        return messages + self.history
+
+    def _compact(self):
+        if self.sent_tokens() <= self.budget_tokens or len(self.history) < self.keep_recent + self.fold_batch:
+            return
+        split = len(self.history) - self.keep_recent
+        # Keep each function_call with its output on the same side of the fold.
+        while split > 0 and (self.history[split].get("type") == "function_call_output"
+                             or self.history[split - 1].get("type") == "function_call"):
+            split -= 1
+        if split < self.fold_batch:
+            return
+        older, self.history = self.history[:split], self.history[split:]
+        self.summary = self.summarize(self.summary, older)
@@ -0,0 +1,244 @@
+"""
+Token and cost accounting per request, with a per-request budget.
+
+Every model call made through llm_client is recorded with its token usage
+and priced with the model's rates (PRICES, in USD per million tokens;
+override with LLM_PRICES="gpt-4o=2.5:1.25:10,..." as input:cached
+input:output). Calls are attributed to the request being run (see track())
+and to its pipeline stage, and the ledger keeps running totals per stage,
+per model and per request category for capacity planning (export_json /
+export_csv).
+
+With a budget (REQUEST_BUDGET_USD, or track(budget=...)), fit_request()
+checks each call's estimated cost against what the request has left.
+A call that would go over is moved down DOWNGRADES to a cheaper model. If
+no model fits, BudgetExceeded is raised, and the pipeline falls back to its
+local paths (fast classifier, templates).
+"""
+import contextvars
+import csv
+import json
+import os
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+from client_manager import DEFAULT_OUTPUT_ESTIMATE
+
+# model -> (input, cached input, output) USD per 1M tokens
+PRICES = {
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4.1": (2.00, 0.50, 8.00),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1-nano": (0.10, 0.025, 0.40),
+}
+
+# Cheaper stand-in for each model when a request's budget runs low.
+DOWNGRADES = {
+    "gpt-4o": "gpt-4o-mini",
+    "gpt-4.1": "gpt-4.1-mini",
+    "gpt-4.1-mini": "gpt-4.1-nano",
+}
+
+REQUEST_BUDGET_USD = float(os.getenv("REQUEST_BUDGET_USD", "0")) or None
+# Per-request records kept for export.
+MAX_REQUEST_RECORDS = 10_000
+
+_current_request = contextvars.ContextVar("current_request", default=None)
+
+
+class BudgetExceeded(RuntimeError):
+    """No model can serve the call within what is left of the request budget."""
+
+
+def parse_prices(spec: str) -> dict:
+    """Parse LLM_PRICES ("model=input:cached:output,...") into PRICES form."""
+    prices = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        model, _, values = item.partition("=")
+        prices[model.strip()] = tuple(float(v) for v in values.split(":"))
+    return prices
+
+
+PRICES.update(parse_prices(os.getenv("LLM_PRICES", "")))
+
+
+def _totals() -> dict:
+    return {"calls": 0, "input_tokens": 0, "cached_tokens": 0, "output_tokens": 0, "cost_usd": 0.0}
+
+
+def _add(totals: dict, other: dict):
+    for field in totals:
+        totals[field] += other[field]
+
+
+def call_cost(model: str, input_tokens: int, cached_tokens: int, output_tokens: int) -> float:
+    """USD cost of one call; 0.0 for a model without known prices."""
+    input_price, cached_price, output_price = PRICES.get(model, (0.0, 0.0, 0.0))
+    uncached = input_tokens - cached_tokens
+    return (uncached * input_price + cached_tokens * cached_price + output_tokens * output_price) / 1_000_000
+
+
+def estimate_cost(request: dict, model: str = None) -> float:
+    """Upper-end cost of `request` (with `model` instead of its own, if given), before sending it."""
+    prompt = request.get("input", "")
+    if not isinstance(prompt, str):
+        prompt = json.dumps(prompt)
+    input_tokens = (len(prompt) + len(request.get("instructions") or "")) // 4
+    output_tokens = request.get("max_output_tokens") or DEFAULT_OUTPUT_ESTIMATE
+    return call_cost(model or request["model"], input_tokens, 0, output_tokens)
+
+
+class RequestCost:
+    """Spend of one pipeline request so far."""
+
+    def __init__(self, request_id: str, budget: float = None):
+        self.request_id = request_id
+        self.budget = budget
+        self.category = None
+        self.totals = _totals()
+        self.stages = {}
+        self.degraded = []  # e.g. "validate: gpt-4o -> gpt-4o-mini", "compose: template"
+
+    def remaining(self) -> float:
+        return float("inf") if self.budget is None else self.budget - self.totals["cost_usd"]
+
+    def summary(self) -> dict:
+        return {
+            "request_id": self.request_id,
+            "category": self.category,
+            "budget_usd": self.budget,
+            **self.totals,
+            "stages": {stage: dict(totals) for stage, totals in self.stages.items()},
+            "degraded": list(self.degraded),
+        }
+
+
+class CostLedger:
+    """Running totals of every recorded call, by stage, model and request category."""
+
+    def __init__(self, max_requests: int = MAX_REQUEST_RECORDS):
+        self._lock = threading.Lock()
+        self.totals = _totals()
+        self.by_stage = {}
+        self.by_model = {}
+        self.by_category = {}
+        self.requests = deque(maxlen=max_requests)
+        self.request_count = 0
+
+    def record(self, stage: str, model: str, usage) -> dict:
+        """Record one call's usage against the ledger and the current request."""
+        if usage is None:
+            return None
+        details = getattr(usage, "input_tokens_details", None)
+        cached = getattr(details, "cached_tokens", 0) or 0
+        entry = {
+            "calls": 1,
+            "input_tokens": usage.input_tokens,
+            "cached_tokens": cached,
+            "output_tokens": usage.output_tokens,
+            "cost_usd": call_cost(model, usage.input_tokens, cached, usage.output_tokens),
+        }
+        with self._lock:
+            _add(self.totals, entry)
+            _add(self.by_stage.setdefault(stage, _totals()), entry)
+            _add(self.by_model.setdefault(model, _totals()), entry)
+            request = _current_request.get()
+            if request is not None:
+                _add(request.totals, entry)
+                _add(request.stages.setdefault(stage, _totals()), entry)
+        return entry
+
+    def finish(self, request: RequestCost):
+        with self._lock:
+            self.request_count += 1
+            _add(self.by_category.setdefault(request.category or "none", _totals()), request.totals)
+            self.requests.append(request.summary())
+
+    def report(self) -> dict:
+        with self._lock:
+            requests = self.request_count
+            return {
+                "totals": dict(self.totals),
+                "requests": requests,
+                "mean_cost_per_request_usd": self.totals["cost_usd"] / requests if requests else 0.0,
+                "by_stage": {k: dict(v) for k, v in self.by_stage.items()},
+                "by_model": {k: dict(v) for k, v in self.by_model.items()},
+                "by_category": {k: dict(v) for k, v in self.by_category.items()},
+                "degraded_requests": sum(1 for r in self.requests if r["degraded"]),
+            }
+
+    def export_json(self, path: str):
+        """Aggregates plus the recent per-request records, as one JSON document."""
+        with open(path, "w") as f:
+            json.dump({**self.report(), "request_records": list(self.requests)}, f, indent=2)
+
+    def export_csv(self, path: str):
+        """One row per (scope, key): scope is total, stage, model, category or request."""
+        report = self.report()
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["scope", "key", *_totals()])
+            writer.writerow(["total", "", *report["totals"].values()])
+            for scope in ("stage", "model", "category"):
+                for key, totals in report[f"by_{scope}"].items():
+                    writer.writerow([scope, key, *totals.values()])
+            for record in list(self.requests):
+                writer.writerow(["request", record["request_id"], *(record[field] for field in _totals())])
+
+
+ledger = CostLedger()
+
+
+@contextmanager
+def track(request_id: str, budget: float = REQUEST_BUDGET_USD):
+    """
+    Attribute model calls in this block (and tasks started from it) to one request.
+
+    Yields the RequestCost; set its `category` before the block ends so
+    the spend is also counted per category.
+    """
+    request = RequestCost(request_id, budget)
+    token = _current_request.set(request)
+    try:
+        yield request
+    finally:
+        _current_request.reset(token)
+        ledger.finish(request)
+
+
+def current_request():
+    return _current_request.get()
+
+
+def note_degraded(what: str):
+    """Record a budget-driven fallback on the current request."""
+    request = _current_request.get()
+    if request is not None:
+        request.degraded.append(what)
+
+
+def fit_request(request: dict, stage: str) -> dict:
+    """
+    `request`, with a cheaper model if the current request's budget needs it.
+
+    Raises:
+        BudgetExceeded: when even the cheapest model would go over budget.
+    """
+    current = _current_request.get()
+    if current is None or current.budget is None:
+        return request
+    remaining = current.remaining()
+    model = request["model"]
+    while estimate_cost(request, model) > remaining:
+        if model not in DOWNGRADES:
+            note_degraded(f"{stage}: over budget")
+            raise BudgetExceeded(
+                f"{stage} needs ~${estimate_cost(request, model):.5f}, ${max(remaining, 0):.5f} left of ${current.budget}"
+            )
+        model = DOWNGRADES[model]
+    if model == request["model"]:
+        return request
+    note_degraded(f"{stage}: {request['model']} -> {model}")
+    return {**request, "model": model}
@@ -1,6 +1,239 @@
-import os
-from dotenv import load_dotenv
-from openai import OpenAI
+import time
 
-load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+import cost_ledger
+import schemas
+from client_manager import clients, load_env
+from response_cache import ResponseCache
+from tracing import current_stage, span, record_span, record_usage, usage_attributes
+from tools.mock_db import store
+
+_UNSET = object()
+_response_cache = _UNSET
+
+def get_response_cache():
+    """
+    The response cache shared by every stage; None when LLM_CACHE_ENABLED=0.
+
+    Built on first use, after .env is loaded, so importing a stage stays cheap.
+    """
+    global _response_cache
+    if _response_cache is _UNSET:
+        load_env()
+        _response_cache = ResponseCache.from_env(context_tag=lambda: store.events_tag)
+    return _response_cache
+
+# Provider prompt-cache effectiveness per stage (keyed by schema name).
+prompt_cache_stats = {}
+
+def _stage_name(request: dict) -> str:
+    fmt = (request.get("text") or {}).get("format") or {}
+    return fmt.get("name", "text")
+
+def _span_attributes(request: dict) -> dict:
+    return {"model": request.get("model"), "schema": _stage_name(request)}
+
+def _with_prompt_cache_key(request: dict) -> dict:
+    # Stage prompts are static instructions followed by the events context,
+    # so one key per stage and events context keeps requests sharing a
+    # prefix on the same provider cache. events_tag fingerprints the context
+    # itself, so the key is the same across restarts and worker processes.
+    if "prompt_cache_key" in request:
+        return request
+    return {**request, "prompt_cache_key": f"{_stage_name(request)}:{store.events_tag}"}
+
+def _record_prompt_cache(request: dict, usage):
+    tokens = usage_attributes(usage)
+    if not tokens:
+        return
+    stats = prompt_cache_stats.setdefault(_stage_name(request), {"input_tokens": 0, "cached_tokens": 0})
+    stats["input_tokens"] += tokens["input_tokens"]
+    stats["cached_tokens"] += tokens["cached_tokens"]
+
+def _ledger_stage(request: dict, stage: str = None) -> str:
+    return stage or current_stage() or _stage_name(request)
+
+def _fit_budget(request: dict, cache, key, stage: str = None):
+    # A cheaper model (or BudgetExceeded) when the request's budget is running
+    # out; the cache key follows the model actually used.
+    fitted = cost_ledger.fit_request(request, _ledger_stage(request, stage))
+    if fitted is not request and key:
+        key = cache.key(fitted)
+    return fitted, key
+
+def cached_token_ratios() -> dict:
+    """Fraction of input tokens served from the provider's prompt cache, per stage."""
+    return {
+        stage: stats["cached_tokens"] / stats["input_tokens"] if stats["input_tokens"] else 0.0
+        for stage, stats in prompt_cache_stats.items()
+    }
+
+def create_response(**request):
+    """client.responses.create with the response cache in front of it, traced."""
+    with span("llm.responses.create", **_span_attributes(request)) as current:
+        cache = get_response_cache()
+        key = cache.key(request) if cache else None
+        cached = cache.get(key) if key else None
+        current.set(cache_hit=cached is not None)
+        if cached is not None:
+            return cached
+        request, key = _fit_budget(request, cache, key)
+        start = time.perf_counter()
+        response = clients.create_response(**_with_prompt_cache_key(request))
+        record_usage(current, response.usage)
+        _record_prompt_cache(request, response.usage)
+        cost_ledger.ledger.record(_ledger_stage(request), request["model"], response.usage)
+        if key:
+            cache.put(key, response.output_text, time.perf_counter() - start)
+        return response
+
+async def create_response_async(**request):
+    """Async variant of create_response."""
+    with span("llm.responses.create", **_span_attributes(request)) as current:
+        cache = get_response_cache()
+        key = cache.key(request) if cache else None
+        cached = await cache.get_async(key) if key else None
+        current.set(cache_hit=cached is not None)
+        if cached is not None:
+            return cached
+        request, key = _fit_budget(request, cache, key)
+        start = time.perf_counter()
+        response = await clients.create_response_async(**_with_prompt_cache_key(request))
+        record_usage(current, response.usage)
+        _record_prompt_cache(request, response.usage)
+        cost_ledger.ledger.record(_ledger_stage(request), request["model"], response.usage)
+        if key:
+            await cache.put_async(key, response.output_text, time.perf_counter() - start)
+        return response
+
+def _repair_request(request: dict, output_text: str, error: Exception) -> dict:
+    # Show the model its own reply and what was wrong with it, instead of
+    # re-running the stage from scratch.
+    feedback = (
+        f"Your reply did not match the required JSON schema: {error}. "
+        "Reply again with only the corrected JSON object."
+    )
+    return {
+        **request,
+        "input": [*request["input"], {"role": "assistant", "content": output_text}, {"role": "user", "content": feedback}],
+    }
+
+def _discard_cached(request: dict):
+    cache = get_response_cache()
+    if cache:
+        cache.discard(cache.key(request))
+
+async def _discard_cached_async(request: dict):
+    cache = get_response_cache()
+    if cache:
+        await cache.discard_async(cache.key(request))
+
+def create_structured(**request) -> dict:
+    """
+    create_response for a json_schema request, parsed and checked against
+    the stage schema registered in `schemas`.
+
+    A response that fails the check is dropped from the cache and repaired
+    with a single follow-up call; if that also fails, SchemaError is raised.
+    """
+    name = _stage_name(request)
+    response = create_response(**request)
+    try:
+        return schemas.parse(name, response.output_text)
+    except schemas.SchemaError as exc:
+        _discard_cached(request)
+        repair = _repair_request(request, response.output_text, exc)
+    with span("llm.schema_repair", schema=name):
+        repaired = create_response(**repair)
+        try:
+            parsed = schemas.parse(name, repaired.output_text)
+        except schemas.SchemaError:
+            _discard_cached(repair)
+            raise
+    schemas.stats[name]["repaired"] += 1
+    return parsed
+
+async def create_structured_async(**request) -> dict:
+    """Async variant of create_structured."""
+    name = _stage_name(request)
+    response = await create_response_async(**request)
+    try:
+        return schemas.parse(name, response.output_text)
+    except schemas.SchemaError as exc:
+        await _discard_cached_async(request)
+        repair = _repair_request(request, response.output_text, exc)
+    with span("llm.schema_repair", schema=name):
+        repaired = await create_response_async(**repair)
+        try:
+            parsed = schemas.parse(name, repaired.output_text)
+        except schemas.SchemaError:
+            await _discard_cached_async(repair)
+            raise
+    schemas.stats[name]["repaired"] += 1
+    return parsed
+
+def stream_response(stage: str = None, **request):
+    """
+    Yield output text deltas for `request` as they arrive.
+
+    A cached response is yielded as a single delta. Time to first token and
+    total generation time are recorded on an "llm.responses.stream" span.
+    The generator runs in its consumer's context, not inside a stage span,
+    so the pipeline stage to charge the call to is passed as `stage`.
+    """
+    start_ns = time.time_ns()
+    start = time.perf_counter()
+    attributes = _span_attributes(request)
+    cache = get_response_cache()
+    key = cache.key(request) if cache else None
+    cached = cache.get(key) if key else None
+    if cached is not None:
+        yield cached.output_text
+        record_span("llm.responses.stream", start_ns, cache_hit=True, **attributes)
+        return
+
+    request, key = _fit_budget(request, cache, key, stage)
+    parts = []
+    for event in clients.create_response(**_with_prompt_cache_key(request), stream=True):
+        if event.type == "response.output_text.delta":
+            if not parts:
+                attributes["ttft"] = time.perf_counter() - start
+            parts.append(event.delta)
+            yield event.delta
+        elif event.type == "response.completed":
+            attributes.update(usage_attributes(event.response.usage))
+            _record_prompt_cache(request, event.response.usage)
+            cost_ledger.ledger.record(_ledger_stage(request, stage), request["model"], event.response.usage)
+    attributes["generation_time"] = time.perf_counter() - start
+    if key:
+        cache.put(key, "".join(parts), attributes["generation_time"])
+    record_span("llm.responses.stream", start_ns, cache_hit=False, **attributes)
+
+async def stream_response_async(stage: str = None, **request):
+    """Async variant of stream_response."""
+    start_ns = time.time_ns()
+    start = time.perf_counter()
+    attributes = _span_attributes(request)
+    cache = get_response_cache()
+    key = cache.key(request) if cache else None
+    cached = await cache.get_async(key) if key else None
+    if cached is not None:
+        yield cached.output_text
+        record_span("llm.responses.stream", start_ns, cache_hit=True, **attributes)
+        return
+
+    request, key = _fit_budget(request, cache, key, stage)
+    parts = []
+    async for event in await clients.create_response_async(**_with_prompt_cache_key(request), stream=True):
+        if event.type == "response.output_text.delta":
+            if not parts:
+                attributes["ttft"] = time.perf_counter() - start
+            parts.append(event.delta)
+            yield event.delta
+        elif event.type == "response.completed":
+            attributes.update(usage_attributes(event.response.usage))
+            _record_prompt_cache(request, event.response.usage)
+            cost_ledger.ledger.record(_ledger_stage(request, stage), request["model"], event.response.usage)
+    attributes["generation_time"] = time.perf_counter() - start
+    if key:
+        await cache.put_async(key, "".join(parts), attributes["generation_time"])
+    record_span("llm.responses.stream", start_ns, cache_hit=False, **attributes)
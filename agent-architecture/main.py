@@ -1,9 +1,13 @@
-from tools.mock_db import get_events_context, add_attendee
+from tools.mock_db import get_events_context, add_attendee, add_attendees
 from stages.input_validator import call_validate_input
 from stages.categorizer import call_categorize
-from stages.registration import call_extract_registration
+from stages.registration import call_extract_registration, call_extract_registrations, is_bulk_registration
 from stages.info_request import call_info_request
-from stages.output import call_compose_output
+from stages.output import stream_compose_output
+from stages.templates import render_fallback, render_template
+from stages.fast_classifier import call_fast_classify, resolved_fraction
+from cost_ledger import BudgetExceeded, note_degraded, track
+from tracing import span
 
 def main():
     print("\n" + "="*60)
@@ -13,28 +17,61 @@ def main():
     user_text = input("\nUser: ")
     print("\n" + "-"*60)
 
-    # Step 1: Validate
-    print("\n[STEP 1: INPUT VALIDATION]")
-    print(f"Input: '{user_text}'")
-    print("→ Checking if input is relevant to event management...")
-    validation = call_validate_input(user_text)
-    print(f"Output: {validation}")
+    with span("request") as current, track(current.trace_id) as cost:
+        try:
+            run(user_text, cost)
+        except BudgetExceeded as exc:
+            # Raised before anything is written to the store; composing, the one
+            # step after a write, falls back to local rendering inside run().
+            note_degraded("over_budget")
+            print(f"\n⚠️ OVER BUDGET ({exc})")
+            print("→ Sorry, I can't handle that request right now. Please try again later.")
+    print(f"Cost: ${cost.totals['cost_usd']:.6f} ({cost.totals['calls']} model calls, "
+          f"{cost.totals['input_tokens']}+{cost.totals['output_tokens']} tokens)")
 
-    if not validation["valid"]:
-        print("\n❌ VALIDATION FAILED")
-        print("→ Sorry, I don't understand that. Please try again.")
-        return
 
-    print("✓ Validation passed")
-    print("-"*60)
+def run(user_text, cost=None):
+    events_context = get_events_context()
+
+    # Step 0: Fast path
+    print("\n[STEP 0: FAST PATH]")
+    print("→ Trying local rules before calling the models...")
+    fast = call_fast_classify(user_text)
+    print(f"Output: {fast} (resolved locally so far: {resolved_fraction():.0%})")
+
+    if fast:
+        print("✓ Resolved locally, skipping validation and categorization")
+        category = {"category": fast["category"], "confidence": fast["confidence"]}
+    else:
+        print("→ Ambiguous, falling through to the models")
+        print("-"*60)
+
+        # Step 1: Validate
+        print("\n[STEP 1: INPUT VALIDATION]")
+        print(f"Input: '{user_text}'")
+        print("→ Checking if input is relevant to event management...")
+        validation = call_validate_input(user_text)
+        print(f"Output: {validation}")
 
-    # Step 2: Categorize
-    print("\n[STEP 2: CATEGORIZATION]")
-    print(f"Input: '{user_text}'")
-    print(f"Context: {get_events_context()}")
-    print("→ Determining request type (registration, info_request, feedback, other)...")
-    category = call_categorize(user_text, get_events_context())
-    print(f"Output: {category}")
+        if not validation["valid"]:
+            print("\n❌ VALIDATION FAILED")
+            print("→ Sorry, I don't understand that. Please try again.")
+            return
+
+        print("✓ Validation passed")
+        print("-"*60)
+
+        # Step 2: Categorize
+        print("\n[STEP 2: CATEGORIZATION]")
+        print(f"Input: '{user_text}'")
+        print(f"Context: {events_context}")
+        print("→ Determining request type (registration, info_request, feedback, other)...")
+        category = call_categorize(user_text, events_context)
+        print(f"Output: {category}")
+
+    if cost is not None:
+        # Spend is also totalled per category (see cost_ledger).
+        cost.category = category["category"]
 
     # Check confidence level
     if category.get("confidence", 0) <= 0.8:
@@ -48,11 +85,20 @@ def main():
     # Step 3: Route
     print(f"\n[STEP 3: ROUTING TO '{category['category'].upper()}' HANDLER]")
     result = None
-    if category["category"] == "registration":
+    if category["category"] == "registration" and is_bulk_registration(user_text):
         print(f"Input: '{user_text}'")
-        print(f"Available events: {get_events_context()}")
+        print(f"Available events: {events_context}")
+        print("→ Several people in one message, extracting all registrations in one call...")
+        rows = call_extract_registrations(user_text, events_context)
+        print(f"Extracted {len(rows)} registrations: {rows}")
+        print("→ Adding attendees to database in one batch...")
+        result = add_attendees(rows)
+        print(f"Database result: {result['registered']} registered, {result['rejected']} rejected")
+    elif category["category"] == "registration":
+        print(f"Input: '{user_text}'")
+        print(f"Available events: {events_context}")
         print("→ Extracting registration details (event, name, email)...")
-        data = call_extract_registration(user_text, get_events_context())
+        data = call_extract_registration(user_text, events_context)
         print(f"Extracted data: {data}")
         print("→ Adding attendee to database...")
         result = add_attendee(data["event_name"], data["name"], data["email"])
@@ -72,12 +118,31 @@ def main():
     print("\n[STEP 4: OUTPUT COMPOSITION]")
     print(f"Input data: {result}")
     print(f"Category: {category['category']}")
-    print("→ Generating user-friendly response...")
-    final_message = call_compose_output(result, category["category"])
+    rendered = render_template(result, category["category"])
+    if rendered is not None:
+        print("→ Known result shape, rendering from a template...")
+    else:
+        print("→ Generating user-friendly response...")
     print(f"\n{'='*60}")
     print("FINAL OUTPUT:")
     print(f"{'='*60}")
-    print(f"\nAssistant: {final_message}")
+    print("\nAssistant: ", end="", flush=True)
+    if rendered is not None:
+        print(rendered)
+    else:
+        stream = stream_compose_output(result, category["category"])
+        try:
+            for delta in stream:
+                print(delta, end="", flush=True)
+        except BudgetExceeded:
+            note_degraded("compose: local fallback")
+            print(render_fallback(result, category["category"]))
+        else:
+            if stream.time_to_first_token is None:
+                # The stream ended without any text.
+                print(f"\n\n(no output, done after {stream.total_time:.2f}s)")
+            else:
+                print(f"\n\n(first token after {stream.time_to_first_token:.2f}s, done after {stream.total_time:.2f}s)")
     print(f"\n{'='*60}\n")
 
 
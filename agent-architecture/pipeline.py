@@ -0,0 +1,373 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from tools.mock_db import get_events_context, add_attendee, add_attendees
+from stages.input_validator import call_validate_input_async
+from stages.categorizer import call_categorize_async
+from stages.registration import call_extract_registration_async, call_extract_registrations_async, is_bulk_registration
+from stages.info_request import call_info_request_async, run_info_query
+from stages.output import call_compose_output_async, stream_compose_output_async
+from stages.fast_classifier import call_fast_classify
+from stages.router import call_route_async
+from stages.templates import render_fallback, render_template
+from cost_ledger import BudgetExceeded, note_degraded, track
+from tracing import span
+
+CONFIDENCE_THRESHOLD = 0.8
+DEFAULT_CONCURRENCY = 200
+
+# "chained": separate validate/categorize/extract calls (the fallback).
+# "fused": one router call that validates, categorizes and extracts together.
+PIPELINE_MODES = ("chained", "fused")
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "chained")
+
+INVALID_MESSAGE = "Sorry, I don't understand that. Please try again."
+LOW_CONFIDENCE_MESSAGE = "I'm not quite sure what you're asking. Could you please rephrase your request?"
+OVER_BUDGET_MESSAGE = "Sorry, I can't handle that request right now. Please try again later."
+
+
+async def extract_for_route(user_text: str, category: str, events_context: str):
+    """
+    Model-side half of Step 3 (extraction and read-only queries).
+
+    Has no side effects on the store, so it is safe to start speculatively
+    before validation has finished.
+    """
+    if category == "registration" and is_bulk_registration(user_text):
+        return {"registrations": await call_extract_registrations_async(user_text, events_context)}
+    if category == "registration":
+        return await call_extract_registration_async(user_text, events_context)
+    if category == "info_request":
+        return await call_info_request_async(user_text)
+    return None
+
+
+def apply_route(category: str, extracted) -> dict:
+    """Commit half of Step 3; only called once validation has passed."""
+    if category == "registration" and "registrations" in extracted:
+        return add_attendees(extracted["registrations"])
+    if category == "registration":
+        return add_attendee(extracted["event_name"], extracted["name"], extracted["email"])
+    if category == "info_request":
+        return extracted
+    return {"message": "No matching route."}
+
+
+async def route_request(user_text: str, category: str, events_context: str) -> dict:
+    """Run the category handler (Step 3) and return its intermediate result."""
+    extracted = await extract_for_route(user_text, category, events_context)
+    return apply_route(category, extracted)
+
+
+async def _timed(outcome: dict, stage: str, awaitable):
+    """Await `awaitable`, recording its wall time under outcome["timings"][stage]."""
+    start = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        outcome["timings"][stage] = time.perf_counter() - start
+
+
+def _is_confident(category: dict) -> bool:
+    return category.get("confidence", 0) > CONFIDENCE_THRESHOLD
+
+
+async def run_pipeline(user_text: str, speculative: bool = False, fast_path: bool = True, mode: str = None,
+                       on_delta=None) -> dict:
+    """
+    Run validate -> categorize -> route -> compose for a single user message.
+
+    `mode` selects between the chained stages and the fused router stage and
+    defaults to PIPELINE_MODE (set per deployment via the environment).
+
+    With fast_path=True, the local rule classifier runs first and, when it
+    is sure, replaces both the validator and categorizer calls.
+
+    With speculative=True, validation and categorization run at the same time
+    and the route extraction starts as soon as a confident category is known.
+    Speculative work is cancelled (or its result dropped) when validation
+    fails or confidence is too low, and nothing is written to the store
+    before validation has passed.
+
+    With an `on_delta` callback, the final message is streamed: it is called
+    with each text delta as soon as it arrives (or once with the canned
+    message when the request is rejected).
+
+    Model calls are recorded in the cost ledger under this request. When
+    the request's budget (REQUEST_BUDGET_USD) runs low, calls move to
+    cheaper models; when no model fits, the message is classified with the
+    local fast path instead and the final message rendered locally, or
+    rejected as "over_budget" when that isn't possible.
+
+    Returns:
+        dict with keys:
+            - status (str): "ok", "invalid", "low_confidence" or "over_budget"
+            - validation (dict): Output of the validator
+            - category (dict | None): Output of the categorizer
+            - result (dict | None): Intermediate result from the route handler
+            - final_message (str): Message to show the user
+            - discarded (list[str]): Speculative stages that were cancelled or thrown away
+            - fast_path (bool): True if classified locally without the models
+            - templated (bool): True if the final message was rendered from a template
+            - timings (dict): Wall time in seconds per stage that ran (plus
+              compose_ttft when streaming)
+            - cost (dict): Tokens and USD spent, per stage, and any
+              budget-driven downgrades (see cost_ledger.RequestCost)
+    """
+    mode = mode or PIPELINE_MODE
+    if mode not in PIPELINE_MODES:
+        raise ValueError(f"Unknown pipeline mode: {mode}")
+    with span("pipeline", mode=mode, speculative=speculative, fast_path=fast_path) as current, \
+            track(current.trace_id) as cost:
+        try:
+            outcome = await _run_pipeline(user_text, speculative, fast_path, mode, on_delta)
+        except BudgetExceeded:
+            # Raised before anything was written to the store (see _compose
+            # for the one stage that runs after a write).
+            outcome = await _run_over_budget(user_text, on_delta, try_fast_path=not fast_path)
+        if on_delta is not None and outcome["status"] != "ok":
+            on_delta(outcome["final_message"])
+        cost.category = (outcome["category"] or {}).get("category")
+        outcome["cost"] = cost.summary()
+        current.set(status=outcome["status"], category=cost.category or "", cost_usd=cost.totals["cost_usd"])
+        return outcome
+
+
+def _new_outcome() -> dict:
+    return {
+        "status": "ok",
+        "validation": None,
+        "category": None,
+        "result": None,
+        "final_message": None,
+        "discarded": [],
+        "fast_path": False,
+        "templated": False,
+        "timings": {},
+    }
+
+
+async def _run_pipeline(user_text: str, speculative: bool, fast_path: bool, mode: str, on_delta) -> dict:
+    outcome = _new_outcome()
+
+    # Step 0: Resolve easy inputs locally
+    fast = call_fast_classify(user_text) if fast_path else None
+    if fast is not None:
+        outcome.update(
+            fast_path=True,
+            validation={"valid": fast["valid"], "reason": fast["reason"]},
+            category={"category": fast["category"], "confidence": fast["confidence"]},
+        )
+        return await _route_and_compose(user_text, outcome, get_events_context(), on_delta)
+
+    if mode == "fused":
+        return await _run_fused(user_text, outcome, on_delta)
+    if speculative:
+        return await _run_speculative(user_text, outcome, on_delta)
+
+    # Step 1: Validate input is relevant to event management domain
+    validation = await _timed(outcome, "validate", call_validate_input_async(user_text))
+    outcome["validation"] = validation
+    if not validation["valid"]:
+        outcome.update(status="invalid", final_message=INVALID_MESSAGE)
+        return outcome
+
+    # Step 2: Categorize request type (registration, info_request, other)
+    events_context = get_events_context()
+    category = await _timed(outcome, "categorize", call_categorize_async(user_text, events_context))
+    outcome["category"] = category
+    if not _is_confident(category):
+        outcome.update(status="low_confidence", final_message=LOW_CONFIDENCE_MESSAGE)
+        return outcome
+
+    return await _route_and_compose(user_text, outcome, events_context, on_delta)
+
+
+async def _compose(outcome: dict, result: dict, category: str, on_delta) -> dict:
+    # Step 4: Compose user-friendly response, locally when the result has a known shape
+    start = time.perf_counter()
+    rendered = render_template(result, category)
+    if rendered is not None:
+        outcome.update(final_message=rendered, templated=True)
+        outcome["timings"]["compose"] = time.perf_counter() - start
+        if on_delta is not None:
+            on_delta(rendered)
+        return outcome
+
+    try:
+        if on_delta is None:
+            outcome["final_message"] = await _timed(outcome, "compose", call_compose_output_async(result, category))
+            return outcome
+
+        stream = stream_compose_output_async(result, category)
+        async for delta in stream:
+            on_delta(delta)
+    except BudgetExceeded:
+        # The route may already have written to the store, so finish locally
+        # rather than re-running the request.
+        note_degraded("compose: local fallback")
+        outcome.update(final_message=render_fallback(result, category), templated=True)
+        if on_delta is not None:
+            on_delta(outcome["final_message"])
+        return outcome
+    outcome["final_message"] = stream.text
+    outcome["timings"]["compose"] = stream.total_time
+    outcome["timings"]["compose_ttft"] = stream.time_to_first_token
+    return outcome
+
+
+async def _route_and_compose(user_text: str, outcome: dict, events_context: str, on_delta) -> dict:
+    category = outcome["category"]["category"]
+
+    # Step 3: Route to appropriate handler based on category
+    result = await _timed(outcome, "route", route_request(user_text, category, events_context))
+    outcome["result"] = result
+    return await _compose(outcome, result, category, on_delta)
+
+
+async def _run_over_budget(user_text: str, on_delta, try_fast_path: bool) -> dict:
+    # The model stages are over budget: only messages the local classifier
+    # is sure about can still be served (if it hasn't been tried already).
+    outcome = _new_outcome()
+    fast = call_fast_classify(user_text) if try_fast_path else None
+    if fast is None:
+        note_degraded("over_budget")
+        outcome.update(status="over_budget", final_message=OVER_BUDGET_MESSAGE)
+        return outcome
+    note_degraded("fast_path")
+    outcome.update(
+        fast_path=True,
+        validation={"valid": fast["valid"], "reason": fast["reason"]},
+        category={"category": fast["category"], "confidence": fast["confidence"]},
+    )
+    try:
+        return await _route_and_compose(user_text, outcome, get_events_context(), on_delta)
+    except BudgetExceeded:
+        note_degraded("over_budget")
+        outcome.update(status="over_budget", result=None, final_message=OVER_BUDGET_MESSAGE)
+        return outcome
+
+
+async def _run_fused(user_text: str, outcome: dict, on_delta) -> dict:
+    # Steps 1-3 (model side) in one round-trip.
+    events_context = get_events_context()
+    routed = await _timed(outcome, "route", call_route_async(user_text, events_context))
+    outcome["validation"] = {"valid": routed["valid"], "reason": routed["reason"]}
+    if not routed["valid"]:
+        outcome.update(status="invalid", final_message=INVALID_MESSAGE)
+        return outcome
+
+    outcome["category"] = {"category": routed["category"], "confidence": routed["confidence"]}
+    if not _is_confident(outcome["category"]):
+        outcome.update(status="low_confidence", final_message=LOW_CONFIDENCE_MESSAGE)
+        return outcome
+
+    category = routed["category"]
+    details = {k: v for k, v in routed["details"].items() if k != "kind"}
+    mismatched = category in ("registration", "info_request") and routed["details"]["kind"] != category
+    if mismatched or (category == "registration" and is_bulk_registration(user_text)):
+        # Details don't match the category, or the router's single-person
+        # details can't hold a group: fall back to the chained extraction.
+        return await _route_and_compose(user_text, outcome, events_context, on_delta)
+
+    if category == "info_request":
+        result = run_info_query(details)
+    else:
+        result = apply_route(category, details)
+    outcome["result"] = result
+    return await _compose(outcome, result, category, on_delta)
+
+
+async def _run_speculative(user_text: str, outcome: dict, on_delta) -> dict:
+    events_context = get_events_context()
+    validation_task = asyncio.create_task(_timed(outcome, "validate", call_validate_input_async(user_text)))
+    category_task = asyncio.create_task(
+        _timed(outcome, "categorize", call_categorize_async(user_text, events_context))
+    )
+    extraction_task = None
+
+    try:
+        # Steps 1 + 2 in parallel; bail out early if validation fails first.
+        await asyncio.wait({validation_task, category_task}, return_when=asyncio.FIRST_COMPLETED)
+        if validation_task.done() and not validation_task.result()["valid"]:
+            outcome.update(status="invalid", validation=validation_task.result(), final_message=INVALID_MESSAGE)
+            return outcome
+
+        category = await category_task
+        outcome["category"] = category
+        if _is_confident(category):
+            # Step 3 (extraction only) while validation is still in flight.
+            extraction_task = asyncio.create_task(
+                _timed(outcome, "route", extract_for_route(user_text, category["category"], events_context))
+            )
+
+        validation = await validation_task
+        outcome["validation"] = validation
+        if not validation["valid"]:
+            outcome.update(status="invalid", final_message=INVALID_MESSAGE)
+            return outcome
+        if not _is_confident(category):
+            outcome.update(status="low_confidence", final_message=LOW_CONFIDENCE_MESSAGE)
+            return outcome
+
+        result = apply_route(category["category"], await extraction_task)
+        outcome["result"] = result
+        return await _compose(outcome, result, category["category"], on_delta)
+    finally:
+        # Validation is still running if categorization or extraction raised,
+        # or if this task itself was cancelled.
+        tasks = (("validate", validation_task), ("categorize", category_task), ("route", extraction_task))
+        for name, task in tasks:
+            if task is None:
+                continue
+            if not task.done():
+                task.cancel()
+                outcome["discarded"].append(name)
+            elif name == "validate":
+                continue
+            elif outcome["status"] == "invalid" or (name == "route" and outcome["status"] != "ok"):
+                outcome["discarded"].append(name)
+
+
+async def run_many(user_texts, concurrency: int = DEFAULT_CONCURRENCY, speculative: bool = False,
+                   fast_path: bool = True, mode: str = None) -> list[dict]:
+    """
+    Run the pipeline for many messages concurrently, at most `concurrency` at a time.
+
+    Results are returned in input order. A failing conversation yields a
+    {"status": "error", ...} entry instead of aborting the others.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _run_one(user_text):
+        enqueued = time.perf_counter()
+        async with semaphore:
+            try:
+                with span("request", queue_time=time.perf_counter() - enqueued):
+                    return await run_pipeline(user_text, speculative=speculative, fast_path=fast_path, mode=mode)
+            except Exception as exc:
+                return {"status": "error", "error": f"{type(exc).__name__}: {exc}", "final_message": None}
+
+    return await asyncio.gather(*(_run_one(text) for text in user_texts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the event pipeline for one message per stdin line.")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--speculative", action="store_true", help="Validate and categorize in parallel.")
+    parser.add_argument("--no-fast-path", action="store_true", help="Always use the model validator/categorizer.")
+    parser.add_argument("--mode", choices=PIPELINE_MODES, default=PIPELINE_MODE)
+    args = parser.parse_args()
+
+    user_texts = [line.strip() for line in sys.stdin if line.strip()]
+    outcomes = asyncio.run(run_many(user_texts, args.concurrency, args.speculative, not args.no_fast_path, args.mode))
+    for user_text, outcome in zip(user_texts, outcomes):
+        print(f"User: {user_text}")
+        print(f"Assistant: {outcome['final_message']}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class CachedResponse:
+    """Stand-in for a Responses API result served from the cache."""
+
+    from_cache = True
+    usage = None
+
+    def __init__(self, output_text: str):
+        self.output_text = output_text
+
+
+class ResponseCache:
+    """
+    Two-tier cache for `responses.create` results.
+
+    Keys cover model + input + text format + the events tag, so anything
+    embedding the events context stops matching as soon as events change.
+    The memory tier is an LRU bounded by entry count, byte size and TTL; the
+    optional disk tier is a SQLite file that survives restarts. The *_async
+    methods do disk-tier I/O in a worker thread so it never blocks the
+    event loop.
+
+    `stats` exposes hits/misses per tier, bytes held in memory and the
+    latency saved (the original call time of every entry served).
+    """
+
+    def __init__(self, max_entries=10_000, max_bytes=64 * 1024 * 1024, ttl=3600.0, path=None, context_tag=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._context_tag = context_tag or (lambda: "")
+        self._last_tag = None
+        self._entries = OrderedDict()  # key -> (output_text, expires_at, size, latency, tag)
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._disk_stale = False  # disk rows from an older events tag not purged yet
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, output_text TEXT, expires_at REAL, latency REAL, tag TEXT)"
+            )
+        self.stats = {"hits": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0, "bytes": 0, "saved_seconds": 0.0}
+
+    @classmethod
+    def from_env(cls, context_tag=None):
+        """Build a cache from LLM_CACHE_* environment variables; None if disabled."""
+        if os.getenv("LLM_CACHE_ENABLED", "1") == "0":
+            return None
+        return cls(
+            max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000")),
+            max_bytes=int(os.getenv("LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+            ttl=float(os.getenv("LLM_CACHE_TTL", "3600")),
+            path=os.getenv("LLM_CACHE_PATH") or None,
+            context_tag=context_tag,
+        )
+
+    def key(self, request: dict) -> str:
+        payload = {
+            "model": request.get("model"),
+            "input": request.get("input"),
+            "text": request.get("text"),
+            "events": self._context_tag(),
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+    def get(self, key: str):
+        cached = self._get_memory(key)
+        if cached is None and self._db is not None:
+            cached = self._get_disk(key)
+        if cached is None:
+            self._record_miss()
+        return cached
+
+    async def get_async(self, key: str):
+        """get() for the event loop: a disk-tier lookup runs in a worker thread."""
+        cached = self._get_memory(key)
+        if cached is None and self._db is not None:
+            cached = await asyncio.to_thread(self._get_disk, key)
+        if cached is None:
+            self._record_miss()
+        return cached
+
+    def put(self, key: str, output_text: str, latency: float):
+        entry = self._put_memory(key, output_text, latency)
+        if self._db is not None:
+            self._put_disk(*entry)
+
+    async def put_async(self, key: str, output_text: str, latency: float):
+        """put() for the event loop: the disk-tier write runs in a worker thread."""
+        entry = self._put_memory(key, output_text, latency)
+        if self._db is not None:
+            await asyncio.to_thread(self._put_disk, *entry)
+
+    def discard(self, key: str):
+        """Forget one entry, e.g. a response that failed schema validation."""
+        self._discard_memory(key)
+        if self._db is not None:
+            self._discard_disk(key)
+
+    async def discard_async(self, key: str):
+        """discard() for the event loop."""
+        self._discard_memory(key)
+        if self._db is not None:
+            await asyncio.to_thread(self._discard_disk, key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.stats["bytes"] = 0
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def hit_rate(self) -> float:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    def _record_hit(self, tier, latency):
+        with self._lock:
+            self.stats["hits"] += 1
+            self.stats[tier] += 1
+            self.stats["saved_seconds"] += latency
+
+    def _record_miss(self):
+        with self._lock:
+            self.stats["misses"] += 1
+
+    # Memory tier: only ever holds self._lock, never waits on disk I/O.
+
+    def _get_memory(self, key):
+        now = time.time()
+        with self._lock:
+            self._purge_stale_tag()
+            entry = self._entries.get(key)
+            if entry and entry[1] > now:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                self.stats["memory_hits"] += 1
+                self.stats["saved_seconds"] += entry[3]
+                return CachedResponse(entry[0])
+            if entry:
+                self._drop(key)
+        return None
+
+    def _put_memory(self, key, output_text, latency):
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._purge_stale_tag()
+            self._store(key, output_text, expires_at, latency)
+            return key, output_text, expires_at, latency, self._last_tag
+
+    def _discard_memory(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+
+    def _store(self, key, output_text, expires_at, latency):
+        if key in self._entries:
+            self._drop(key)
+        size = len(output_text.encode())
+        self._entries[key] = (output_text, expires_at, size, latency, self._last_tag)
+        self.stats["bytes"] += size
+        while self._entries and (len(self._entries) > self.max_entries or self.stats["bytes"] > self.max_bytes):
+            self._drop(next(iter(self._entries)))
+
+    def _drop(self, key):
+        entry = self._entries.pop(key)
+        self.stats["bytes"] -= entry[2]
+
+    def _purge_stale_tag(self):
+        # Entries made under an older events context can never be hit again;
+        # free them as soon as the tag moves (on disk at the next disk access).
+        tag = self._context_tag()
+        if tag == self._last_tag:
+            return
+        if self._last_tag is not None:
+            for key in [k for k, e in self._entries.items() if e[4] != tag]:
+                self._drop(key)
+            self._disk_stale = self._db is not None
+        self._last_tag = tag
+
+    # Disk tier: blocking sqlite calls under self._db_lock; the async methods
+    # run these in a worker thread.
+
+    def _get_disk(self, key):
+        now = time.time()
+        with self._db_lock:
+            self._purge_disk()
+            row = self._db.execute(
+                "SELECT output_text, expires_at, latency FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        if not row or row[1] <= now:
+            return None
+        with self._lock:
+            self._store(key, row[0], row[1], row[2])
+        self._record_hit("disk_hits", row[2])
+        return CachedResponse(row[0])
+
+    def _put_disk(self, key, output_text, expires_at, latency, tag):
+        with self._db_lock:
+            self._purge_disk()
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (key, output_text, expires_at, latency, tag),
+            )
+            self._db.commit()
+
+    def _discard_disk(self, key):
+        with self._db_lock:
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._db.commit()
+
+    def _purge_disk(self):
+        if self._disk_stale:
+            self._disk_stale = False
+            self._db.execute("DELETE FROM responses WHERE tag != ?", (self._last_tag,))
+            self._db.commit()
@@ -0,0 +1,166 @@
+"""
+Registry of stage response schemas, compiled into validator functions.
+
+Stages register their json_schema once at import time. `register` compiles
+the schema into a tree of closures, so checking a parsed response is a few
+direct type/key checks with no schema interpretation per call. Supports the
+subset used by strict structured outputs: type, properties, required,
+additionalProperties, enum, anyOf, items, min/maxItems, minLength and
+minimum/maximum.
+"""
+import json
+import time
+
+REGISTRY = {}  # schema name -> (schema, validator)
+
+# Per schema name: responses checked, failures, successful repairs and
+# total seconds spent validating.
+stats = {}
+
+
+class SchemaError(ValueError):
+    """A model response that does not match its stage schema."""
+
+
+def register(name: str, schema: dict) -> dict:
+    """Compile and register `schema` under its json_schema `name`; returns the schema."""
+    REGISTRY[name] = (schema, compile_schema(schema))
+    return schema
+
+
+def parse(name: str, output_text: str):
+    """json.loads `output_text` and check it against schema `name`; raises SchemaError."""
+    counters = stats.setdefault(name, {"validated": 0, "failures": 0, "repaired": 0, "seconds": 0.0})
+    start = time.perf_counter()
+    try:
+        try:
+            value = json.loads(output_text)
+        except ValueError as exc:
+            raise SchemaError(f"$: not valid JSON ({exc})") from None
+        entry = REGISTRY.get(name)
+        if entry is not None:
+            entry[1](value, "$")
+        return value
+    except SchemaError:
+        counters["failures"] += 1
+        raise
+    finally:
+        counters["validated"] += 1
+        counters["seconds"] += time.perf_counter() - start
+
+
+def failure_rates() -> dict:
+    return {name: c["failures"] / c["validated"] for name, c in stats.items() if c["validated"]}
+
+
+_TYPE_CHECKS = {
+    "object": lambda v: isinstance(v, dict),
+    "array": lambda v: isinstance(v, list),
+    "string": lambda v: isinstance(v, str),
+    "boolean": lambda v: isinstance(v, bool),
+    "integer": lambda v: isinstance(v, int) and not isinstance(v, bool),
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "null": lambda v: v is None,
+}
+
+
+def compile_schema(schema: dict):
+    """Turn a JSON schema into a `check(value, path)` function that raises SchemaError."""
+    if "anyOf" in schema:
+        return _compile_any_of([compile_schema(option) for option in schema["anyOf"]])
+
+    checks = []
+    kind = schema.get("type")
+    if kind is not None:
+        kinds = kind if isinstance(kind, list) else [kind]
+        type_checks = [_TYPE_CHECKS[k] for k in kinds]
+
+        def check_type(value, path):
+            if not any(t(value) for t in type_checks):
+                raise SchemaError(f"{path}: expected {' or '.join(kinds)}, got {type(value).__name__}")
+        checks.append(check_type)
+
+    if "enum" in schema:
+        allowed = list(schema["enum"])
+
+        def check_enum(value, path):
+            if value not in allowed:
+                raise SchemaError(f"{path}: {value!r} is not one of {allowed}")
+        checks.append(check_enum)
+
+    if "properties" in schema or "required" in schema:
+        checks.append(_compile_object(schema))
+    if "items" in schema or "minItems" in schema or "maxItems" in schema:
+        checks.append(_compile_array(schema))
+    if "minLength" in schema:
+        min_length = schema["minLength"]
+
+        def check_min_length(value, path):
+            if isinstance(value, str) and len(value) < min_length:
+                raise SchemaError(f"{path}: shorter than {min_length}")
+        checks.append(check_min_length)
+    if "minimum" in schema or "maximum" in schema:
+        low, high = schema.get("minimum"), schema.get("maximum")
+
+        def check_range(value, path):
+            if (low is not None and value < low) or (high is not None and value > high):
+                raise SchemaError(f"{path}: {value} outside [{low}, {high}]")
+        checks.append(check_range)
+
+    if len(checks) == 1:
+        return checks[0]
+
+    def check_all(value, path):
+        for check in checks:
+            check(value, path)
+    return check_all
+
+
+def _compile_object(schema: dict):
+    properties = {name: compile_schema(prop) for name, prop in schema.get("properties", {}).items()}
+    required = list(schema.get("required", []))
+    closed = schema.get("additionalProperties") is False
+
+    def check_object(value, path):
+        if not isinstance(value, dict):
+            return
+        for name in required:
+            if name not in value:
+                raise SchemaError(f"{path}: missing required property {name!r}")
+        for name, item in value.items():
+            check = properties.get(name)
+            if check is not None:
+                check(item, f"{path}.{name}")
+            elif closed:
+                raise SchemaError(f"{path}: unexpected property {name!r}")
+    return check_object
+
+
+def _compile_array(schema: dict):
+    check_item = compile_schema(schema["items"]) if "items" in schema else None
+    min_items, max_items = schema.get("minItems"), schema.get("maxItems")
+
+    def check_array(value, path):
+        if not isinstance(value, list):
+            return
+        if min_items is not None and len(value) < min_items:
+            raise SchemaError(f"{path}: fewer than {min_items} items")
+        if max_items is not None and len(value) > max_items:
+            raise SchemaError(f"{path}: more than {max_items} items")
+        if check_item is not None:
+            for i, item in enumerate(value):
+                check_item(item, f"{path}[{i}]")
+    return check_array
+
+
+def _compile_any_of(options: list):
+    def check_any_of(value, path):
+        errors = []
+        for option in options:
+            try:
+                option(value, path)
+                return
+            except SchemaError as exc:
+                errors.append(str(exc))
+        raise SchemaError(f"{path}: matched no anyOf option ({'; '.join(errors)})")
+    return check_any_of
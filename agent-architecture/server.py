@@ -0,0 +1,274 @@
+"""
+Long-running HTTP service for the event assistant.
+
+Keeps the pipeline, the pooled OpenAI clients and the event store warm in
+one process, so a request only pays pipeline time:
+
+    POST /v1/messages          {"message": "..."} -> pipeline outcome as JSON
+    POST /v1/messages/stream   same body; the final message as server-sent events
+    GET  /healthz              the process is up
+    GET  /readyz               warmed up and not draining (503 otherwise)
+
+The request body may also set "mode" ("chained" or "fused"). SIGTERM and
+SIGINT stop new connections, fail readiness, and wait up to
+--drain-timeout seconds for in-flight requests before exiting.
+
+    python server.py --port 8080
+"""
+import argparse
+import asyncio
+import json
+import signal
+
+from client_manager import clients
+from pipeline import run_pipeline, PIPELINE_MODE, PIPELINE_MODES
+from tools.mock_db import get_events_context
+from tracing import span
+
+DEFAULT_PORT = 8080
+DEFAULT_DRAIN_TIMEOUT = 30.0
+MAX_BODY_BYTES = 64 * 1024
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class AssistantServer:
+    """asyncio HTTP/1.1 server around run_pipeline, with keep-alive and graceful drain."""
+
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT, mode=PIPELINE_MODE, speculative=False,
+                 fast_path=True, drain_timeout=DEFAULT_DRAIN_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.mode = mode
+        self.speculative = speculative
+        self.fast_path = fast_path
+        self.drain_timeout = drain_timeout
+        self.ready = False
+        self.draining = False
+        self._server = None
+        self._connections = set()  # open StreamWriters
+        self._active = 0           # requests being handled
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port, backlog=512)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self.warm_up()
+        self.ready = True
+
+    def warm_up(self):
+        # Build the async client (and its connection pool) and the events
+        # context now rather than on the first request.
+        clients.async_client
+        get_events_context()
+
+    async def serve_forever(self):
+        await self.start()
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        print(f"Event assistant listening on http://{self.host}:{self.port}")
+        await stop.wait()
+        await self.shutdown()
+
+    async def shutdown(self):
+        """Stop accepting, let in-flight requests finish (up to drain_timeout), then close."""
+        self.draining = True
+        self._server.close()
+        try:
+            await asyncio.wait_for(self._idle.wait(), self.drain_timeout)
+        except asyncio.TimeoutError:
+            pass
+        for writer in list(self._connections):
+            writer.close()
+        await self._server.wait_closed()
+        await clients.aclose()
+
+    async def _handle_connection(self, reader, writer):
+        self._connections.add(writer)
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except HttpError as exc:
+                    await _send_json(writer, exc.status, {"error": str(exc)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close" and not self.draining
+
+                self._active += 1
+                self._idle.clear()
+                try:
+                    await self._dispatch(method, path, body, writer, keep_alive)
+                finally:
+                    self._active -= 1
+                    if not self._active:
+                        self._idle.set()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+
+    async def _dispatch(self, method, path, body, writer, keep_alive):
+        if path == "/healthz":
+            await _send_json(writer, 200, {"status": "ok"}, keep_alive)
+        elif path == "/readyz":
+            if self.ready and not self.draining:
+                await _send_json(writer, 200, {"status": "ready"}, keep_alive)
+            else:
+                await _send_json(writer, 503, {"status": "draining" if self.draining else "starting"}, keep_alive)
+        elif path in ("/v1/messages", "/v1/messages/stream"):
+            if method != "POST":
+                await _send_json(writer, 405, {"error": "Use POST"}, keep_alive)
+            elif self.draining:
+                await _send_json(writer, 503, {"error": "Server is shutting down"}, keep_alive=False)
+            else:
+                try:
+                    message, mode = self._parse_message(body)
+                except HttpError as exc:
+                    await _send_json(writer, exc.status, {"error": str(exc)}, keep_alive)
+                    return
+                if path.endswith("/stream"):
+                    await self._stream(message, mode, writer, keep_alive)
+                else:
+                    await self._respond(message, mode, writer, keep_alive)
+        else:
+            await _send_json(writer, 404, {"error": f"No route for {path}"}, keep_alive)
+
+    def _parse_message(self, body: bytes):
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            raise HttpError(400, "Body must be JSON") from None
+        message = payload.get("message") if isinstance(payload, dict) else None
+        if not isinstance(message, str) or not message.strip():
+            raise HttpError(400, 'Body must have a non-empty "message" string')
+        mode = payload.get("mode") or self.mode
+        if mode not in PIPELINE_MODES:
+            raise HttpError(400, f"mode must be one of {list(PIPELINE_MODES)}")
+        return message, mode
+
+    async def _respond(self, message, mode, writer, keep_alive):
+        try:
+            with span("request", endpoint="messages"):
+                outcome = await run_pipeline(message, speculative=self.speculative, fast_path=self.fast_path, mode=mode)
+        except Exception as exc:
+            await _send_json(writer, 500, {"error": f"{type(exc).__name__}: {exc}"}, keep_alive)
+            return
+        await _send_json(writer, 200, outcome, keep_alive)
+
+    async def _stream(self, message, mode, writer, keep_alive):
+        writer.write(_head(200, "text/event-stream", keep_alive, {"Transfer-Encoding": "chunked", "Cache-Control": "no-cache"}))
+
+        def on_delta(delta):
+            _write_chunk(writer, _sse("delta", {"text": delta}))
+
+        try:
+            with span("request", endpoint="messages/stream"):
+                outcome = await run_pipeline(message, speculative=self.speculative, fast_path=self.fast_path,
+                                             mode=mode, on_delta=on_delta)
+            summary = {k: outcome[k] for k in ("status", "category", "fast_path", "templated", "timings", "cost")}
+            _write_chunk(writer, _sse("done", summary))
+        except Exception as exc:
+            _write_chunk(writer, _sse("error", {"error": f"{type(exc).__name__}: {exc}"}))
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+
+async def _read_request(reader):
+    """Read one HTTP/1.1 request; None when the client closed the connection."""
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, path, _version = line.decode("latin-1").split()
+    except ValueError:
+        raise HttpError(400, "Malformed request line") from None
+
+    headers = {}
+    while True:
+        header = await reader.readline()
+        if header in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = header.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get("content-length", "0"))
+    except ValueError:
+        raise HttpError(400, "Bad Content-Length") from None
+    if length > MAX_BODY_BYTES:
+        raise HttpError(413, f"Body larger than {MAX_BODY_BYTES} bytes")
+    body = await reader.readexactly(length) if length else b""
+    return method, path.split("?", 1)[0], headers, body
+
+
+def _head(status: int, content_type: str, keep_alive: bool, extra: dict = None) -> bytes:
+    lines = [
+        f"HTTP/1.1 {status} {REASONS[status]}",
+        f"Content-Type: {content_type}",
+        f"Connection: {'keep-alive' if keep_alive else 'close'}",
+    ]
+    lines += [f"{name}: {value}" for name, value in (extra or {}).items()]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode()
+
+
+async def _send_json(writer, status: int, payload: dict, keep_alive: bool):
+    body = json.dumps(payload, default=str).encode()
+    writer.write(_head(status, "application/json", keep_alive, {"Content-Length": len(body)}) + body)
+    await writer.drain()
+
+
+def _sse(event: str, data: dict) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n".encode()
+
+
+def _write_chunk(writer, data: bytes):
+    writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the event assistant over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--mode", choices=PIPELINE_MODES, default=PIPELINE_MODE)
+    parser.add_argument("--speculative", action="store_true", help="Validate and categorize in parallel.")
+    parser.add_argument("--no-fast-path", action="store_true", help="Always use the model validator/categorizer.")
+    parser.add_argument("--drain-timeout", type=float, default=DEFAULT_DRAIN_TIMEOUT,
+                        help="Seconds to wait for in-flight requests on shutdown")
+    args = parser.parse_args()
+
+    server = AssistantServer(
+        host=args.host,
+        port=args.port,
+        mode=args.mode,
+        speculative=args.speculative,
+        fast_path=not args.no_fast_path,
+        drain_timeout=args.drain_timeout,
+    )
+    asyncio.run(server.serve_forever())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,56 @@
-import json
-from llm_client import client
+import schemas
+from llm_client import create_structured, create_structured_async
+from tracing import traced
 
-def call_categorize(user_text: str, events_context: str) -> dict:
-    schema = {
-        "type": "object",
-        "properties": {
-            "category": {"type": "string", "description": "One of: registration, info_request, other"},
-            "confidence": {"type": "number"},
+# Static instructions first, events context last, so the system prompt
+# keeps a byte-stable prefix for provider-side prompt caching.
+INSTRUCTIONS = (
+    "Classify user requests into registration, info_request, or other. "
+    "Use confidence to indicate how confident you are in your classification. "
+    "Confidence should be a number between 0 and 1. 1 is the highest confidence."
+)
+
+CATEGORIZATION_SCHEMA = schemas.register("categorization_response", {
+    "type": "object",
+    "properties": {
+        "category": {
+            "type": "string",
+            "enum": ["registration", "info_request", "other"],
+            "description": "One of: registration, info_request, other",
         },
-        "required": ["category", "confidence"],
-        "additionalProperties": False,
-    }
+        "confidence": {"type": "number"},
+    },
+    "required": ["category", "confidence"],
+    "additionalProperties": False,
+})
 
+def _categorization_request(user_text: str, events_context: str) -> dict:
     conversation = [
         {
             "role": "system",
-            "content": f"Classify user requests into registration, info_request, or other. Events:\n{events_context}. Use confidence to indicate how confident you are in your classification. Confidence should be a number between 0 and 1. 1 is the highest confidence."
+            "content": f"{INSTRUCTIONS}\n\nEvents:\n{events_context}"
         },
         {"role": "user", "content": user_text},
     ]
 
-    response = client.responses.create(
-        model="gpt-4o-mini",
-        input=conversation,
-        text={
+    return {
+        "model": "gpt-4o-mini",
+        "input": conversation,
+        "text": {
             "format": {
                 "type": "json_schema",
                 "name": "categorization_response",
-                "schema": schema,
+                "schema": CATEGORIZATION_SCHEMA,
                 "strict": True,
             }
         },
-    )
+    }
+
+@traced("stage.categorize")
+def call_categorize(user_text: str, events_context: str) -> dict:
+    return create_structured(**_categorization_request(user_text, events_context))
 
-    return json.loads(response.output_text)
+@traced("stage.categorize")
+async def call_categorize_async(user_text: str, events_context: str) -> dict:
+    """Async variant of call_categorize."""
+    return await create_structured_async(**_categorization_request(user_text, events_context))
@@ -0,0 +1,62 @@
+import re
+from tools.mock_db import store
+from tools.registrations import EMAIL_RE
+from tracing import traced
+
+REGISTER_RE = re.compile(r"\b(register|sign\s+(me\s+|us\s+)?up|enrol+|rsvp|add\s+me|book\s+me)\b", re.IGNORECASE)
+INFO_RE = re.compile(
+    r"\b(list|show|what|which|who|how\s+many|count|find)\b.*\b(events?|attendees?|attending|registered|going)\b",
+    re.IGNORECASE,
+)
+# A bare question about the store itself ("list events", "how many attendees?"),
+# with nothing else in the message that could change its meaning.
+STORE_ONLY_RE = re.compile(
+    r"^\s*(please\s+)?(list|show(\s+me)?|what\s+are|count|how\s+many)\s+(all\s+)?(the\s+)?"
+    r"(events|attendees|registrations)(\s+(are\s+there|overall|in\s+total))?\s*(please)?\s*[?.!]*\s*$",
+    re.IGNORECASE,
+)
+NEGATION_RE = re.compile(
+    r"\b(not|no|never|don'?t|doesn'?t|won'?t|can'?t|cannot|cancel|unregister|remove|stop)\b|n't\b",
+    re.IGNORECASE,
+)
+
+# Counters for how much traffic never reaches the model stages.
+stats = {"resolved": 0, "fallthrough": 0}
+
+
+def match_event(user_text: str):
+    """Return the first known event whose name appears in the text, if any."""
+    text = user_text.casefold()
+    return next((e for e in store.events if e["name"].casefold() in text), None)
+
+
+@traced("stage.fast_classify")
+def call_fast_classify(user_text: str):
+    """
+    Classify easy inputs locally, ahead of the validator and categorizer.
+
+    Only unambiguous messages are resolved: a registration needs a
+    registration verb, an email and a known event name; an info request
+    needs a known event name or to be a bare question about the store
+    ("list events"). Anything with a negation goes to the models.
+
+    Returns:
+        dict with keys valid, reason, category and confidence (the merged
+        shape of the validator and categorizer outputs) when a rule matches,
+        or None when the input is ambiguous and must go to the models.
+    """
+    result = None
+    if not NEGATION_RE.search(user_text):
+        if REGISTER_RE.search(user_text):
+            if EMAIL_RE.search(user_text) and match_event(user_text):
+                result = {"valid": True, "reason": "registration rule", "category": "registration", "confidence": 0.95}
+        elif STORE_ONLY_RE.match(user_text) or (INFO_RE.search(user_text) and match_event(user_text)):
+            result = {"valid": True, "reason": "info request rule", "category": "info_request", "confidence": 0.9}
+
+    stats["resolved" if result else "fallthrough"] += 1
+    return result
+
+
+def resolved_fraction() -> float:
+    total = stats["resolved"] + stats["fallthrough"]
+    return stats["resolved"] / total if total else 0.0
@@ -1,7 +1,75 @@
-import json
-from llm_client import client
-from tools.mock_db import EVENTS, ATTENDEES, list_attendees
+import schemas
+from llm_client import create_structured, create_structured_async
+from tracing import traced
+from tools.mock_db import get_events_context, list_attendees, store
+
+# Cap on person-lookup results passed on to composition.
+SEARCH_RESULT_LIMIT = 50
+
+INSTRUCTIONS = (
+    "Extract the query intent and entities from the user's request. "
+    "Determine what type of information they're asking for:\n"
+    "- list_events: User wants to see all available events\n"
+    "- get_attendees: User wants attendees for specific event(s)\n"
+    "- search_attendee: User is looking for a specific person\n"
+    "- count_attendees: User wants statistics/counts\n"
+    "- find_by_email: User is searching by email\n"
+    "- general_info: General information request"
+)
+
+EXTRACTION_SCHEMA = schemas.register("info_request_extraction", {
+    "type": "object",
+    "properties": {
+        "query_type": {
+            "type": "string",
+            "enum": ["list_events", "get_attendees", "search_attendee", "count_attendees", "find_by_email", "general_info"],
+            "description": "Type of information request"
+        },
+        "events_mentioned": {
+            "type": "array",
+            "items": {"type": "string"},
+            "description": "List of event names mentioned (can be empty)"
+        },
+        "attendee_name": {
+            "type": "string",
+            "description": "Name of attendee to search for (empty string if not applicable)"
+        },
+        "attendee_email": {
+            "type": "string",
+            "description": "Email of attendee to search for (empty string if not applicable)"
+        },
+        "wants_count": {
+            "type": "boolean",
+            "description": "Whether user wants counts/statistics"
+        }
+    },
+    "required": ["query_type", "events_mentioned", "attendee_name", "attendee_email", "wants_count"],
+    "additionalProperties": False,
+})
 
+def _extraction_request(user_text: str) -> dict:
+    extraction_conversation = [
+        {
+            "role": "system",
+            "content": f"{INSTRUCTIONS}\n\nAvailable events in the system:\n{get_events_context()}",
+        },
+        {"role": "user", "content": user_text},
+    ]
+
+    return {
+        "model": "gpt-4o-mini",
+        "input": extraction_conversation,
+        "text": {
+            "format": {
+                "type": "json_schema",
+                "name": "info_request_extraction",
+                "schema": EXTRACTION_SCHEMA,
+                "strict": True,
+            }
+        },
+    }
+
+@traced("stage.info_request")
 def call_info_request(user_text: str) -> dict:
     """
     Process user queries requesting information about events or attendees.
@@ -15,87 +83,38 @@ def call_info_request(user_text: str) -> dict:
     """
 
     # Step 1: Determine the query intent and extract relevant entities
-    extraction_schema = {
-        "type": "object",
-        "properties": {
-            "query_type": {
-                "type": "string",
-                "enum": ["list_events", "get_attendees", "search_attendee", "count_attendees", "find_by_email", "general_info"],
-                "description": "Type of information request"
-            },
-            "events_mentioned": {
-                "type": "array",
-                "items": {"type": "string"},
-                "description": "List of event names mentioned (can be empty)"
-            },
-            "attendee_name": {
-                "type": "string",
-                "description": "Name of attendee to search for (empty string if not applicable)"
-            },
-            "attendee_email": {
-                "type": "string",
-                "description": "Email of attendee to search for (empty string if not applicable)"
-            },
-            "wants_count": {
-                "type": "boolean",
-                "description": "Whether user wants counts/statistics"
-            }
-        },
-        "required": ["query_type", "events_mentioned", "attendee_name", "attendee_email", "wants_count"],
-        "additionalProperties": False,
-    }
+    query_params = create_structured(**_extraction_request(user_text))
 
-    extraction_conversation = [
-        {
-            "role": "system",
-            "content": (
-                "Extract the query intent and entities from the user's request. "
-                "Determine what type of information they're asking for:\n"
-                "- list_events: User wants to see all available events\n"
-                "- get_attendees: User wants attendees for specific event(s)\n"
-                "- search_attendee: User is looking for a specific person\n"
-                "- count_attendees: User wants statistics/counts\n"
-                "- find_by_email: User is searching by email\n"
-                "- general_info: General information request\n\n"
-                "Available events in the system:\n" + "\n".join(f"- {e['name']}" for e in EVENTS)
-            ),
-        },
-        {"role": "user", "content": user_text},
-    ]
+    # Step 2: Execute the appropriate query based on type
+    return run_info_query(query_params)
 
-    extraction_resp = client.responses.create(
-        model="gpt-4o-mini",
-        input=extraction_conversation,
-        text={
-            "format": {
-                "type": "json_schema",
-                "name": "info_request_extraction",
-                "schema": extraction_schema,
-                "strict": True,
-            }
-        },
-    )
+@traced("stage.info_request")
+async def call_info_request_async(user_text: str) -> dict:
+    """Async variant of call_info_request."""
+    query_params = await create_structured_async(**_extraction_request(user_text))
+    return run_info_query(query_params)
 
-    query_params = json.loads(extraction_resp.output_text)
+@traced("stage.info_query")
+def run_info_query(query_params: dict) -> dict:
+    """Execute an extracted info_request query against the event store."""
     query_type = query_params.get("query_type")
     events_mentioned = query_params.get("events_mentioned", [])
     attendee_name = query_params.get("attendee_name", "")
     attendee_email = query_params.get("attendee_email", "")
     wants_count = query_params.get("wants_count", False)
 
-    # Step 2: Execute the appropriate query based on type
     response_data = {"query_type": query_type}
 
     if query_type == "list_events":
-        # Return all events with their details
+        # Return all events with their details (counts come from the store's counters)
+        counts = store.attendee_counts()
         response_data["events"] = []
-        for event in EVENTS:
-            attendees = list_attendees(event["name"])
+        for event in store.events:
             response_data["events"].append({
                 "id": event["id"],
                 "name": event["name"],
-                "attendee_count": len(attendees),
-                "attendees": attendees if not wants_count else None
+                "attendee_count": counts.get(event["id"], 0),
+                "attendees": list_attendees(event["name"]) if not wants_count else None
             })
 
     elif query_type == "get_attendees":
@@ -112,7 +131,7 @@ def call_info_request(user_text: str) -> dict:
         else:
             # No specific events, return all
             response_data["events"] = []
-            for event in EVENTS:
+            for event in store.events:
                 attendees = list_attendees(event["name"])
                 response_data["events"].append({
                     "event_name": event["name"],
@@ -122,64 +141,41 @@ def call_info_request(user_text: str) -> dict:
 
     elif query_type == "search_attendee":
         # Search for attendee by name across all events
-        response_data["results"] = []
-        search_term = attendee_name.lower() if attendee_name else ""
-
-        for attendee in ATTENDEES:
-            if search_term and search_term in attendee["name"].lower():
-                # Find which event this attendee is registered for
-                event = next((e for e in EVENTS if e["id"] == attendee["event_id"]), None)
-                if event:
-                    response_data["results"].append({
-                        "name": attendee["name"],
-                        "email": attendee["email"],
-                        "event": event["name"]
-                    })
+        response_data["results"] = store.search_attendees("name", attendee_name or "", SEARCH_RESULT_LIMIT)
 
     elif query_type == "count_attendees":
-        # Return attendance statistics
+        # Return attendance statistics, from the counters: O(events), no attendee scan
+        counts = store.attendee_counts()
         response_data["statistics"] = {
-            "total_events": len(EVENTS),
-            "total_attendees": len(ATTENDEES),
+            "total_events": len(store.events),
+            "total_attendees": sum(counts.values()),
             "events": []
         }
 
-        for event in EVENTS:
-            attendees = list_attendees(event["name"])
+        for event in store.events:
             response_data["statistics"]["events"].append({
                 "event_name": event["name"],
-                "attendee_count": len(attendees)
+                "attendee_count": counts.get(event["id"], 0)
             })
 
     elif query_type == "find_by_email":
         # Find events by attendee email
-        response_data["results"] = []
-        search_email = attendee_email.lower() if attendee_email else ""
-
-        for attendee in ATTENDEES:
-            if search_email and search_email in attendee["email"].lower():
-                event = next((e for e in EVENTS if e["id"] == attendee["event_id"]), None)
-                if event:
-                    response_data["results"].append({
-                        "name": attendee["name"],
-                        "email": attendee["email"],
-                        "event": event["name"]
-                    })
+        response_data["results"] = store.search_attendees("email", attendee_email or "", SEARCH_RESULT_LIMIT)
 
     else:  # general_info
-        # Provide a general overview
+        # Provide a general overview, from the counters
+        counts = store.attendee_counts()
         response_data["overview"] = {
-            "total_events": len(EVENTS),
-            "total_attendees": len(ATTENDEES),
+            "total_events": len(store.events),
+            "total_attendees": sum(counts.values()),
             "events": []
         }
 
-        for event in EVENTS:
-            attendees = list_attendees(event["name"])
+        for event in store.events:
             response_data["overview"]["events"].append({
                 "name": event["name"],
                 "id": event["id"],
-                "attendee_count": len(attendees)
+                "attendee_count": counts.get(event["id"], 0)
             })
 
     return response_data
\ No newline at end of file
@@ -1,52 +1,138 @@
-import json
-from llm_client import client
+import os
+import random
 
-def call_validate_input(user_text: str) -> dict:
-    """
-    Validate user input specifically for the events domain.
+import schemas
+from llm_client import create_structured, create_structured_async
+from tracing import current_span, traced
 
-    Returns:
-        dict with keys:
-            - valid (bool): True if input is relevant/parseable
-            - reason (str): Short explanation if invalid
-    """
-    schema = {
-        "type": "object",
-        "properties": {
-            "valid": {"type": "boolean"},
-            "reason": {"type": "string"},
-        },
-        "required": ["valid", "reason"],
-        "additionalProperties": False,
-    }
+# "single": every request goes to gpt-4o.
+# "cascade": gpt-4o-mini answers with a confidence, and only answers below
+# CASCADE_THRESHOLD are escalated to gpt-4o.
+VALIDATOR_MODE = os.getenv("VALIDATOR_MODE", "single")
+CASCADE_THRESHOLD = float(os.getenv("VALIDATOR_CASCADE_THRESHOLD", "0.85"))
+# Fraction of confident gpt-4o-mini answers also checked by gpt-4o, so
+# agreement is measured above the threshold too, not only below it.
+CASCADE_AUDIT_RATE = float(os.getenv("VALIDATOR_CASCADE_AUDIT_RATE", "0"))
+
+CASCADE_MODEL = "gpt-4o-mini"
+ESCALATION_MODEL = "gpt-4o"
+
+INSTRUCTIONS = (
+    "You are a domain-specific validator for an events management system. "
+    "Your job is to validate whether the user's input is relevant to event management in any way. "
+    "Instructions:\n"
+    "- Return valid=True if the input is relevant to event management in any way.\n"
+    "- Return valid=False if the input is irrelevant, ambiguous, or cannot be mapped to the domain.\n"
+)
+CONFIDENCE_INSTRUCTIONS = (
+    "- Return confidence between 0 and 1 for how sure you are of valid (1 is the highest confidence).\n"
+)
+
+VALIDATION_SCHEMA = schemas.register("validation_response", {
+    "type": "object",
+    "properties": {
+        "valid": {"type": "boolean"},
+        "reason": {"type": "string"},
+    },
+    "required": ["valid", "reason"],
+    "additionalProperties": False,
+})
+
+CASCADE_SCHEMA = schemas.register("validation_confidence_response", {
+    "type": "object",
+    "properties": {
+        "valid": {"type": "boolean"},
+        "reason": {"type": "string"},
+        "confidence": {"type": "number"},
+    },
+    "required": ["valid", "reason", "confidence"],
+    "additionalProperties": False,
+})
+
+# Cascade outcomes: escalations, and how often gpt-4o agreed with
+# gpt-4o-mini when both answered (escalated or audited requests).
+cascade_stats = {"requests": 0, "escalated": 0, "audited": 0, "compared": 0, "agreed": 0}
+
+
+def escalation_rate() -> float:
+    return cascade_stats["escalated"] / cascade_stats["requests"] if cascade_stats["requests"] else 0.0
+
+
+def agreement_rate() -> float:
+    return cascade_stats["agreed"] / cascade_stats["compared"] if cascade_stats["compared"] else 0.0
 
+
+def _validation_request(user_text: str, model: str = ESCALATION_MODEL, with_confidence: bool = False) -> dict:
+    instructions = INSTRUCTIONS + CONFIDENCE_INSTRUCTIONS if with_confidence else INSTRUCTIONS
     conversation = [
-        {
-            "role": "system",
-            "content": (
-                "You are a domain-specific validator for an events management system. "
-                "Your job is to validate whether the user's input is relevant to event management in any way. "
-                "Instructions:\n"
-                "- Return valid=True if the input is relevant to event management in any way.\n"
-                "- Return valid=False if the input is irrelevant, ambiguous, or cannot be mapped to the domain.\n"
-            ),
-        },
+        {"role": "system", "content": instructions},
         {"role": "user", "content": user_text},
     ]
 
-    response = client.responses.create(
-        model="gpt-4o",
-        input=conversation,
-        text={
+    return {
+        "model": model,
+        "input": conversation,
+        "text": {
             "format": {
                 "type": "json_schema",
-                "name": "validation_response",
-                "schema": schema,
+                "name": "validation_confidence_response" if with_confidence else "validation_response",
+                "schema": CASCADE_SCHEMA if with_confidence else VALIDATION_SCHEMA,
                 "strict": True,
             }
         },
-    )
+    }
+
+
+def _needs_gpt4o(first: dict) -> bool:
+    """Whether the gpt-4o-mini answer is escalated (or audited) by gpt-4o."""
+    cascade_stats["requests"] += 1
+    if first["confidence"] < CASCADE_THRESHOLD:
+        cascade_stats["escalated"] += 1
+        return True
+    if CASCADE_AUDIT_RATE and random.random() < CASCADE_AUDIT_RATE:
+        cascade_stats["audited"] += 1
+        return True
+    return False
+
+
+def _settle(first: dict, second) -> dict:
+    """Record agreement and pick the answer to return ({valid, reason}); gpt-4o wins when it ran."""
+    span = current_span()
+    if second is None:
+        if span is not None:
+            span.set(validator_model=CASCADE_MODEL, checked_by_gpt4o=False, confidence=first["confidence"])
+        return {"valid": first["valid"], "reason": first["reason"]}
+    cascade_stats["compared"] += 1
+    cascade_stats["agreed"] += first["valid"] == second["valid"]
+    if span is not None:
+        span.set(validator_model=ESCALATION_MODEL, checked_by_gpt4o=True, confidence=first["confidence"],
+                 agreed=first["valid"] == second["valid"])
+    return second
+
+
+@traced("stage.validate")
+def call_validate_input(user_text: str) -> dict:
+    """
+    Validate user input specifically for the events domain.
+
+    Returns:
+        dict with keys:
+            - valid (bool): True if input is relevant/parseable
+            - reason (str): Short explanation if invalid
+    """
+    if VALIDATOR_MODE != "cascade":
+        return create_structured(**_validation_request(user_text))
+
+    first = create_structured(**_validation_request(user_text, CASCADE_MODEL, with_confidence=True))
+    second = create_structured(**_validation_request(user_text)) if _needs_gpt4o(first) else None
+    return _settle(first, second)
 
-    parsed = json.loads(response.output_text)
+@traced("stage.validate")
+async def call_validate_input_async(user_text: str) -> dict:
+    """Async variant of call_validate_input."""
+    if VALIDATOR_MODE != "cascade":
+        return await create_structured_async(**_validation_request(user_text))
 
-    return parsed
+    first = await create_structured_async(**_validation_request(user_text, CASCADE_MODEL, with_confidence=True))
+    second = await create_structured_async(**_validation_request(user_text)) if _needs_gpt4o(first) else None
+    return _settle(first, second)
@@ -1,14 +1,89 @@
 import json
-from llm_client import client
+import time
+from llm_client import create_response, create_response_async, stream_response, stream_response_async
+from tracing import traced
 
-def call_compose_output(intermediate_result: dict, category: str) -> str:
+def _compose_request(intermediate_result: dict, category: str) -> dict:
     conversation = [
         {"role": "system", "content": f"Compose a clear user-facing message for category '{category}'."},
         {"role": "user", "content": json.dumps(intermediate_result)},
     ]
 
-    response = client.responses.create(
-        model="gpt-4o-mini",
-        input=conversation,
-    )
+    return {
+        "model": "gpt-4o-mini",
+        "input": conversation,
+    }
+
+@traced("stage.compose")
+def call_compose_output(intermediate_result: dict, category: str) -> str:
+    response = create_response(**_compose_request(intermediate_result, category))
+    return response.output_text
+
+@traced("stage.compose")
+async def call_compose_output_async(intermediate_result: dict, category: str) -> str:
+    """Async variant of call_compose_output."""
+    response = await create_response_async(**_compose_request(intermediate_result, category))
     return response.output_text
+
+
+class ComposedStream:
+    """
+    Text deltas of a composed message, yielded as they arrive.
+
+    Once iteration finishes, `text` holds the full message and
+    `time_to_first_token` / `total_time` the timings in seconds.
+    """
+
+    def __init__(self, deltas):
+        self._deltas = deltas
+        self.text = None
+        self.time_to_first_token = None
+        self.total_time = None
+
+    def __iter__(self):
+        start = time.perf_counter()
+        parts = []
+        for delta in self._deltas:
+            if not parts:
+                self.time_to_first_token = time.perf_counter() - start
+            parts.append(delta)
+            yield delta
+        self.total_time = time.perf_counter() - start
+        self.text = "".join(parts)
+
+    def result(self) -> str:
+        """Drain the stream if needed and return the full message."""
+        if self.text is None:
+            for _ in self:
+                pass
+        return self.text
+
+
+class AsyncComposedStream(ComposedStream):
+    """Async variant of ComposedStream."""
+
+    async def __aiter__(self):
+        start = time.perf_counter()
+        parts = []
+        async for delta in self._deltas:
+            if not parts:
+                self.time_to_first_token = time.perf_counter() - start
+            parts.append(delta)
+            yield delta
+        self.total_time = time.perf_counter() - start
+        self.text = "".join(parts)
+
+    async def result(self) -> str:
+        if self.text is None:
+            async for _ in self:
+                pass
+        return self.text
+
+
+def stream_compose_output(intermediate_result: dict, category: str) -> ComposedStream:
+    """Streaming variant of call_compose_output."""
+    return ComposedStream(stream_response(stage="compose", **_compose_request(intermediate_result, category)))
+
+def stream_compose_output_async(intermediate_result: dict, category: str) -> AsyncComposedStream:
+    """Async streaming variant of call_compose_output."""
+    return AsyncComposedStream(stream_response_async(stage="compose", **_compose_request(intermediate_result, category)))
@@ -1,34 +1,80 @@
-import json
-from llm_client import client
+import schemas
+from llm_client import create_structured, create_structured_async
+from tools.registrations import EMAIL_RE
+from tracing import traced
 
-def call_extract_registration(user_text: str, events_context: str) -> dict:
-    schema = {
-        "type": "object",
-        "properties": {
-            "event_name": {"type": "string"},
-            "name": {"type": "string"},
-            "email": {"type": "string"},
-        },
-        "required": ["event_name", "name", "email"],
-        "additionalProperties": False,
-    }
+INSTRUCTIONS = "Extract event_name, name, and email from this text."
+BULK_INSTRUCTIONS = (
+    "Extract every person to register from this text, each with event_name, name, and email. "
+    "If one event is named for the whole group, use it for every person."
+)
+
+REGISTRATION_SCHEMA = schemas.register("registration_extraction", {
+    "type": "object",
+    "properties": {
+        "event_name": {"type": "string"},
+        "name": {"type": "string"},
+        "email": {"type": "string"},
+    },
+    "required": ["event_name", "name", "email"],
+    "additionalProperties": False,
+})
+
+BULK_REGISTRATION_SCHEMA = schemas.register("bulk_registration_extraction", {
+    "type": "object",
+    "properties": {
+        "registrations": {"type": "array", "items": REGISTRATION_SCHEMA},
+    },
+    "required": ["registrations"],
+    "additionalProperties": False,
+})
+
+def is_bulk_registration(user_text: str) -> bool:
+    """More than one email address in the message: extract everyone in one call."""
+    return len(EMAIL_RE.findall(user_text)) > 1
 
+def _registration_request(user_text: str, events_context: str, bulk: bool = False) -> dict:
+    instructions = BULK_INSTRUCTIONS if bulk else INSTRUCTIONS
     conversation = [
-        {"role": "system", "content": f"Extract event_name, name, and email from this text. Events:\n{events_context}"},
+        {"role": "system", "content": f"{instructions}\n\nEvents:\n{events_context}"},
         {"role": "user", "content": user_text},
     ]
 
-    response = client.responses.create(
-        model="gpt-4o-mini",
-        input=conversation,
-        text={
+    return {
+        "model": "gpt-4o-mini",
+        "input": conversation,
+        "text": {
             "format": {
                 "type": "json_schema",
-                "name": "registration_extraction",
-                "schema": schema,
+                "name": "bulk_registration_extraction" if bulk else "registration_extraction",
+                "schema": BULK_REGISTRATION_SCHEMA if bulk else REGISTRATION_SCHEMA,
                 "strict": True,
             }
         },
-    )
+    }
+
+@traced("stage.extract_registration")
+def call_extract_registration(user_text: str, events_context: str) -> dict:
+    return create_structured(**_registration_request(user_text, events_context))
+
+@traced("stage.extract_registration")
+async def call_extract_registration_async(user_text: str, events_context: str) -> dict:
+    """Async variant of call_extract_registration."""
+    return await create_structured_async(**_registration_request(user_text, events_context))
+
+@traced("stage.extract_registrations")
+def call_extract_registrations(user_text: str, events_context: str) -> list[dict]:
+    """
+    Extract many registrations from one message in a single call.
+
+    Returns:
+        list of dicts with keys event_name, name and email (as from
+        call_extract_registration), one per person.
+    """
+    return create_structured(**_registration_request(user_text, events_context, bulk=True))["registrations"]
 
-    return json.loads(response.output_text)
+@traced("stage.extract_registrations")
+async def call_extract_registrations_async(user_text: str, events_context: str) -> list[dict]:
+    """Async variant of call_extract_registrations."""
+    extracted = await create_structured_async(**_registration_request(user_text, events_context, bulk=True))
+    return extracted["registrations"]
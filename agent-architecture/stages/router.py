@@ -0,0 +1,106 @@
+import schemas
+from llm_client import create_structured, create_structured_async
+from tracing import traced
+
+REGISTRATION_DETAILS = {
+    "type": "object",
+    "properties": {
+        "kind": {"type": "string", "enum": ["registration"]},
+        "event_name": {"type": "string"},
+        "name": {"type": "string"},
+        "email": {"type": "string"},
+    },
+    "required": ["kind", "event_name", "name", "email"],
+    "additionalProperties": False,
+}
+
+INFO_REQUEST_DETAILS = {
+    "type": "object",
+    "properties": {
+        "kind": {"type": "string", "enum": ["info_request"]},
+        "query_type": {
+            "type": "string",
+            "enum": ["list_events", "get_attendees", "search_attendee", "count_attendees", "find_by_email", "general_info"],
+        },
+        "events_mentioned": {"type": "array", "items": {"type": "string"}},
+        "attendee_name": {"type": "string"},
+        "attendee_email": {"type": "string"},
+        "wants_count": {"type": "boolean"},
+    },
+    "required": ["kind", "query_type", "events_mentioned", "attendee_name", "attendee_email", "wants_count"],
+    "additionalProperties": False,
+}
+
+NO_DETAILS = {
+    "type": "object",
+    "properties": {"kind": {"type": "string", "enum": ["none"]}},
+    "required": ["kind"],
+    "additionalProperties": False,
+}
+
+ROUTER_SCHEMA = schemas.register("router_response", {
+    "type": "object",
+    "properties": {
+        "valid": {"type": "boolean"},
+        "reason": {"type": "string"},
+        "category": {"type": "string", "enum": ["registration", "info_request", "other"]},
+        "confidence": {"type": "number"},
+        "details": {"anyOf": [REGISTRATION_DETAILS, INFO_REQUEST_DETAILS, NO_DETAILS]},
+    },
+    "required": ["valid", "reason", "category", "confidence", "details"],
+    "additionalProperties": False,
+})
+
+INSTRUCTIONS = (
+    "You are the front door of an events management system. In one pass:\n"
+    "1. valid: true if the input is relevant to event management in any way, false if it is "
+    "irrelevant, ambiguous, or cannot be mapped to the domain. Give a short reason.\n"
+    "2. category: registration, info_request, or other, with a confidence between 0 and 1 "
+    "(1 is the highest confidence).\n"
+    "3. details: for registration, kind=registration with event_name, name and email; "
+    "for info_request, kind=info_request with query_type (list_events, get_attendees, "
+    "search_attendee, count_attendees, find_by_email, general_info), events_mentioned, "
+    "attendee_name, attendee_email (empty strings if not applicable) and wants_count; "
+    "otherwise kind=none."
+)
+
+def _router_request(user_text: str, events_context: str) -> dict:
+    conversation = [
+        {
+            "role": "system",
+            "content": f"{INSTRUCTIONS}\n\nEvents:\n{events_context}",
+        },
+        {"role": "user", "content": user_text},
+    ]
+
+    return {
+        "model": "gpt-4o-mini",
+        "input": conversation,
+        "text": {
+            "format": {
+                "type": "json_schema",
+                "name": "router_response",
+                "schema": ROUTER_SCHEMA,
+                "strict": True,
+            }
+        },
+    }
+
+@traced("stage.route")
+def call_route(user_text: str, events_context: str) -> dict:
+    """
+    Validate, categorize and extract in a single structured-output call.
+
+    Returns:
+        dict with keys:
+            - valid (bool), reason (str): as from call_validate_input
+            - category (str), confidence (float): as from call_categorize
+            - details (dict): registration fields or info_request_extraction
+              fields, tagged by "kind" ("registration", "info_request", "none")
+    """
+    return create_structured(**_router_request(user_text, events_context))
+
+@traced("stage.route")
+async def call_route_async(user_text: str, events_context: str) -> dict:
+    """Async variant of call_route."""
+    return await create_structured_async(**_router_request(user_text, events_context))
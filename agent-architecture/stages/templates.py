@@ -0,0 +1,162 @@
+import json
+
+from stages.info_request import SEARCH_RESULT_LIMIT
+from tools.mock_db import store
+
+# Longest attendee list rendered in full before summarising the rest.
+MAX_LISTED = 20
+
+TEMPLATES = {}  # (category, query_type or None) -> render function
+
+
+def template(category: str, query_type: str = None):
+    """Register a render function for results of `category` (and `query_type`)."""
+    def register(fn):
+        TEMPLATES[(category, query_type)] = fn
+        return fn
+    return register
+
+
+def render_template(intermediate_result: dict, category: str):
+    """
+    Format a route result locally when its shape is known.
+
+    Returns:
+        The user-facing message, or None when no template applies and the
+        LLM composer should be used (general_info, unknown shapes).
+    """
+    if intermediate_result.get("error"):
+        key = (category, "error")
+    elif "batch" in intermediate_result:
+        key = (category, "batch")
+    else:
+        key = (category, intermediate_result.get("query_type"))
+    render = TEMPLATES.get(key)
+    if render is None:
+        return None
+    try:
+        return render(intermediate_result)
+    except (KeyError, TypeError):
+        # Right category, unexpected shape: let the LLM handle it.
+        return None
+
+
+def render_fallback(intermediate_result: dict, category: str) -> str:
+    """
+    Plain local rendering of any route result.
+
+    For results without a template when the LLM composer can't be used
+    (the request is over its cost budget).
+    """
+    rendered = render_template(intermediate_result, category)
+    if rendered is not None:
+        return rendered
+    overview = intermediate_result.get("overview")
+    if overview:
+        lines = [f"- {e['name']} ({_plural(e['attendee_count'], 'attendee')})" for e in overview["events"]]
+        return (
+            f"There are {_plural(overview['total_events'], 'event')} with "
+            f"{_plural(overview['total_attendees'], 'attendee')} registered:\n" + "\n".join(lines)
+        )
+    return "Here is what I found:\n" + json.dumps(intermediate_result, indent=2)
+
+
+def _names(attendees: list) -> str:
+    names = [a["name"] for a in attendees[:MAX_LISTED]]
+    if len(attendees) > MAX_LISTED:
+        names.append(f"and {len(attendees) - MAX_LISTED} more")
+    return ", ".join(names)
+
+
+def _plural(count: int, word: str, plural: str = None) -> str:
+    return f"{count} {word}" if count == 1 else f"{count} {plural or word + 's'}"
+
+
+@template("registration")
+def _registration(result: dict) -> str:
+    event = store.get_event_by_id(result["event_id"])
+    event_name = event["name"] if event else f"event {result['event_id']}"
+    return f"You're all set! {result['name']} ({result['email']}) is now registered for {event_name}."
+
+
+@template("registration", "batch")
+def _registration_batch(result: dict) -> str:
+    by_event = {}
+    for row in result["batch"]:
+        if row["status"] == "registered":
+            by_event.setdefault(row["event_id"], []).append(row)
+    lines = []
+    for event_id, rows in by_event.items():
+        event = store.get_event_by_id(event_id)
+        event_name = event["name"] if event else f"event {event_id}"
+        lines.append(f"{event_name} ({_plural(len(rows), 'person', 'people')}): {_names(rows)}")
+    if lines:
+        message = f"You're all set! Registered {_plural(result['registered'], 'person', 'people')}:\n" + "\n".join(lines)
+    else:
+        message = "I couldn't register anyone from that list."
+    rejected = [row for row in result["batch"] if row["status"] == "rejected"]
+    if rejected:
+        notes = [f"- {row['name'] or row['email'] or 'unnamed'}: {row['error'].lower()}" for row in rejected[:MAX_LISTED]]
+        if len(rejected) > MAX_LISTED:
+            notes.append(f"- and {len(rejected) - MAX_LISTED} more")
+        message += f"\nNot registered ({len(rejected)}):\n" + "\n".join(notes)
+    return message
+
+
+@template("registration", "error")
+@template("info_request", "error")
+def _error(result: dict) -> str:
+    if result["error"] == "Event not found":
+        events = ", ".join(e["name"] for e in store.events)
+        return f"Sorry, I couldn't find that event. Available events: {events}."
+    return f"Sorry, something went wrong: {result['error']}."
+
+
+@template("other")
+def _other(result: dict) -> str:
+    if "message" not in result:
+        raise KeyError("message")
+    return "I can help you register for events or find information about events and attendees."
+
+
+@template("info_request", "list_events")
+def _list_events(result: dict) -> str:
+    lines = [f"- {e['name']} ({_plural(e['attendee_count'], 'attendee')})" for e in result["events"]]
+    return "Here are the available events:\n" + "\n".join(lines)
+
+
+@template("info_request", "get_attendees")
+def _get_attendees(result: dict) -> str:
+    lines = []
+    for e in result["events"]:
+        if store.get_event(e["event_name"]) is None:
+            lines.append(f"{e['event_name']}: event not found.")
+        elif e["attendees"]:
+            lines.append(f"{e['event_name']} ({_plural(e['attendee_count'], 'attendee')}): {_names(e['attendees'])}")
+        else:
+            lines.append(f"{e['event_name']}: no attendees registered yet.")
+    return "\n".join(lines)
+
+
+@template("info_request", "count_attendees")
+def _count_attendees(result: dict) -> str:
+    stats = result["statistics"]
+    lines = [f"- {e['event_name']}: {_plural(e['attendee_count'], 'attendee')}" for e in stats["events"]]
+    return (
+        f"There are {_plural(stats['total_attendees'], 'attendee')} across "
+        f"{_plural(stats['total_events'], 'event')}:\n" + "\n".join(lines)
+    )
+
+
+@template("info_request", "search_attendee")
+@template("info_request", "find_by_email")
+def _search_results(result: dict) -> str:
+    matches = result["results"]
+    if not matches:
+        return "I couldn't find any attendees matching that."
+    lines = [f"- {m['name']} ({m['email']}) - {m['event']}" for m in matches]
+    if len(matches) >= SEARCH_RESULT_LIMIT:
+        # The search stopped at the limit; there may be more.
+        header = f"Here are the first {len(matches)} matches (there may be more; try a more specific search):"
+        return header + "\n" + "\n".join(lines)
+    return f"I found {_plural(len(matches), 'match', 'matches')}:\n" + "\n".join(lines)
@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+# The modules live flat in agent-architecture/, which is not a package.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    """A freshly seeded event store, once per backend."""
+    from tools.mock_db import open_store
+
+    store = open_store(request.param, str(tmp_path / "events.db"))
+    yield store
+    if request.param == "sqlite":
+        store.close()
@@ -0,0 +1,37 @@
+from tools.mock_db import SEED_ATTENDEES, check_attendee_counts
+
+
+def test_seeded_counts(store):
+    assert check_attendee_counts(store) == []
+    assert store.count_attendees() == len(SEED_ATTENDEES)
+    assert store.attendee_counts() == {1: 1, 2: 1}
+
+
+def test_counts_follow_adds_and_removals(store):
+    added = [store.add_attendee("AI Conference", f"Guest {i}", f"guest{i}@example.com") for i in range(5)]
+    store.add_attendees([{"event_name": "Developer Meetup", "name": "Bob", "email": "bob@example.com"}])
+    store.flush()
+    assert store.attendee_counts() == {1: 2, 2: 6}
+
+    for attendee in added[:3]:
+        assert store.remove_attendee(attendee["id"])["id"] == attendee["id"]
+    assert "error" in store.remove_attendee(added[0]["id"])
+
+    assert store.attendee_counts() == {1: 2, 2: 3}
+    assert store.count_attendees() == 5
+    assert check_attendee_counts(store) == []
+
+
+def test_new_event_starts_at_zero(store):
+    event = store.add_event("Hackathon")
+    assert store.attendee_counts()[event["id"]] == 0
+    assert check_attendee_counts(store) == []
+
+
+def test_removal_keeps_lookups_consistent(store):
+    attendee = store.add_attendee("Developer Meetup", "Carol", "carol@example.com")
+    store.flush()
+    store.remove_attendee(attendee["id"])
+    assert store.find_by_email("carol@example.com") == []
+    assert store.search_attendees("name", "carol") == []
+    assert [a["name"] for a in store.list_attendees("Developer Meetup")] == ["John Doe"]
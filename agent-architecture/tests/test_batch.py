@@ -0,0 +1,82 @@
+import asyncio
+import json
+import random
+
+import batch
+
+
+def _write_lines(path, lines):
+    path.write_text("".join(line + "\n" for line in lines))
+
+
+def _records(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def _stub_pipeline(monkeypatch, seen):
+    async def run_pipeline(message, **options):
+        seen.append(message)
+        await asyncio.sleep(random.uniform(0, 0.005))
+        return {"status": "ok", "final_message": message.upper(), "timings": {"validate": 0.001}}
+    monkeypatch.setattr(batch, "run_pipeline", run_pipeline)
+
+
+def test_malformed_lines_get_error_records(monkeypatch, tmp_path):
+    seen = []
+    _stub_pipeline(monkeypatch, seen)
+    source, output = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    _write_lines(source, ['{"message": "a"}', "{broken", '["not", "an object"]', '{"message": 3}', '{"message": "b"}'])
+
+    summary = asyncio.run(batch.run_batch(str(source), str(output), workers=2))
+
+    records = _records(output)
+    assert [r["line"] for r in records] == [0, 1, 2, 3, 4]
+    assert [r["status"] for r in records] == ["ok", "error", "error", "error", "ok"]
+    assert "Invalid JSON" in records[1]["error"]
+    assert summary["statuses"] == {"ok": 2, "error": 3}
+    assert sorted(seen) == ["a", "b"]
+
+
+def test_ordered_output_with_a_bounded_window(monkeypatch, tmp_path):
+    workers = 2
+    window = workers * batch.ORDERED_WINDOW_FACTOR
+    first_done = asyncio.Event()
+    started_behind_first = []
+
+    async def run_pipeline(message, **options):
+        line = int(message)
+        if line == 0:
+            # Slow first line: everything after it has to wait to be written.
+            await asyncio.sleep(0.05)
+            first_done.set()
+        elif not first_done.is_set():
+            started_behind_first.append(line)
+        return {"status": "ok", "final_message": message, "timings": {}}
+
+    monkeypatch.setattr(batch, "run_pipeline", run_pipeline)
+    source, output = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    _write_lines(source, [json.dumps({"message": str(i)}) for i in range(50)])
+
+    asyncio.run(batch.run_batch(str(source), str(output), workers=workers))
+
+    assert [r["line"] for r in _records(output)] == list(range(50))
+    # Reading ran ahead of the slow line, but only up to the window.
+    assert max(started_behind_first) == window - 1
+
+
+def test_resume_skips_done_lines_and_repairs_a_cut_record(monkeypatch, tmp_path):
+    seen = []
+    _stub_pipeline(monkeypatch, seen)
+    source, output = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    _write_lines(source, [json.dumps({"message": m}) for m in "abcd"])
+    # Lines 0 and 1 finished; line 2 was cut short by a crash.
+    output.write_text(json.dumps({"line": 0, "status": "ok"}) + "\n" + json.dumps({"line": 1, "status": "ok"})
+                      + "\n" + '{"line": 2, "sta')
+
+    summary = asyncio.run(batch.run_batch(str(source), str(output), workers=2, resume=True))
+
+    assert summary["skipped"] == 2
+    assert sorted(seen) == ["c", "d"]
+    lines = output.read_text().splitlines()
+    assert lines[2] == '{"line": 2, "sta'
+    assert [json.loads(line)["line"] for line in lines[3:]] == [2, 3]
@@ -0,0 +1,67 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from client_manager import ClientManager, estimate_tokens
+
+REQUEST = {"model": "m", "input": "x" * 4000}
+
+
+def _failing(exc):
+    def create(**request):
+        raise exc
+    return SimpleNamespace(responses=SimpleNamespace(create=create))
+
+
+def _manager():
+    manager = ClientManager(limits={"m": (60, 100_000)})
+    return manager, manager.limiters["m"]
+
+
+def test_failed_call_releases_its_reservation():
+    manager, limiter = _manager()
+    manager._client = _failing(RuntimeError("429"))
+    with pytest.raises(RuntimeError):
+        manager.create_response(**REQUEST)
+    assert limiter.tokens.level == pytest.approx(limiter.tokens.capacity)
+    assert limiter.requests.level == pytest.approx(limiter.requests.capacity)
+
+
+def test_async_call_cancelled_in_flight_releases_its_reservation():
+    manager, limiter = _manager()
+    in_flight = asyncio.Event()
+
+    async def create(**request):
+        in_flight.set()
+        await asyncio.sleep(10)
+
+    manager._async_client = SimpleNamespace(responses=SimpleNamespace(create=create))
+
+    async def run():
+        task = asyncio.create_task(manager.create_response_async(**REQUEST))
+        await in_flight.wait()
+        assert limiter.tokens.level < limiter.tokens.capacity - estimate_tokens(REQUEST) / 2
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert limiter.tokens.level == pytest.approx(limiter.tokens.capacity)
+
+
+def test_async_call_cancelled_while_queued_leaves_the_queue():
+    manager, limiter = _manager()
+    limiter.tokens.level = -100_000  # a minute of debt ahead of this call
+
+    async def run():
+        task = asyncio.create_task(manager.create_response_async(**REQUEST))
+        await asyncio.sleep(0.01)
+        assert limiter.stats["queued"] == 1
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert limiter.stats["queued"] == 0
+    assert limiter.tokens.level == pytest.approx(-100_000, abs=100)
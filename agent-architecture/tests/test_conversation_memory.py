@@ -0,0 +1,72 @@
+from conversation_memory import ConversationMemory
+
+SYSTEM = {"role": "system", "content": "You help with events."}
+
+
+class Summarizer:
+    def __init__(self):
+        self.folds = []
+
+    def __call__(self, summary, messages):
+        self.folds.append(list(messages))
+        return f"{summary} +{len(messages)}".strip()
+
+
+def _call(n):
+    return {"type": "function_call", "call_id": f"call_{n}", "name": "list_attendees", "arguments": "{}"}
+
+
+def _memory(summarizer, **options):
+    options = {"budget_tokens": 60, "keep_recent": 3, "fold_batch": 2, **options}
+    return ConversationMemory(SYSTEM, summarize=summarizer, **options)
+
+
+def test_within_budget_sends_everything():
+    summarizer = Summarizer()
+    memory = _memory(summarizer, budget_tokens=10_000)
+    for n in range(8):
+        memory.add({"role": "user", "content": f"message {n}"})
+    assert memory.messages() == [SYSTEM] + memory.history
+    assert len(memory.history) == 8 and summarizer.folds == []
+
+
+def test_over_budget_folds_old_messages_into_the_summary():
+    summarizer = Summarizer()
+    memory = _memory(summarizer)
+    for n in range(10):
+        memory.add({"role": "user", "content": f"message number {n} " * 3})
+    messages = memory.messages()
+    assert len(summarizer.folds) == 1
+    assert messages[0] == SYSTEM
+    assert messages[1]["content"].startswith("Summary of the earlier conversation:")
+    assert messages[2:] == memory.history
+    assert len(memory.history) == 3
+    assert memory.record_turn()["saved_tokens"] > 0
+
+
+def test_fold_never_splits_a_call_from_its_output():
+    summarizer = Summarizer()
+    memory = _memory(summarizer)
+    for n in range(4):
+        memory.add({"role": "user", "content": f"look up event {n} " * 3})
+        memory.add_tool_result(_call(n), {"items": [n] * 10})
+    memory.messages()
+
+    assert summarizer.folds
+    for messages in summarizer.folds + [memory.history]:
+        for i, message in enumerate(messages):
+            if message.get("type") == "function_call":
+                assert messages[i + 1]["type"] == "function_call_output"
+                assert messages[i + 1]["call_id"] == message["call_id"]
+            if message.get("type") == "function_call_output":
+                assert i > 0 and messages[i - 1]["call_id"] == message["call_id"]
+
+
+def test_large_tool_results_become_a_reference():
+    memory = _memory(Summarizer(), max_tool_result_tokens=10)
+    result = {"items": list(range(200))}
+    output = memory.add_tool_result(_call(1), result)
+    assert output["call_id"] == "call_1"
+    assert output["output"].startswith("[truncated to tool-result-1")
+    assert memory.lookup("tool-result-1") == result
+    assert memory.lookup("tool-result-2") is None
@@ -0,0 +1,29 @@
+import pytest
+
+
+def test_duplicate_event_name_is_rejected(store):
+    store.add_event("Dup Event")
+    store.flush()
+    with pytest.raises(ValueError):
+        store.add_event("dup event")
+    assert [e["name"] for e in store.events].count("Dup Event") == 1
+
+
+def test_store_keeps_working_after_a_failed_write(store):
+    with pytest.raises(ValueError):
+        store.add_event("developer meetup")  # seeded as "Developer Meetup"
+    event = store.add_event("Another")
+    attendee = store.add_attendee("Another", "Dana", "dana@example.com")
+    store.flush()
+    assert store.get_event("another") == event
+    assert store.list_attendees("Another") == [attendee]
+
+
+def test_failed_write_keeps_earlier_pending_writes(store):
+    store.add_event("First")
+    with pytest.raises(ValueError):
+        store.add_event("FIRST")
+    store.add_event("Second")
+    store.flush()
+    names = [e["name"] for e in store.events]
+    assert "First" in names and "Second" in names
@@ -0,0 +1,38 @@
+import pytest
+
+from stages.fast_classifier import call_fast_classify
+
+
+@pytest.mark.parametrize("text", [
+    "Please register me for the AI Conference, jane@example.com",
+    "Sign me up for Developer Meetup: Sam Lee, sam@example.com",
+])
+def test_unambiguous_registration(text):
+    assert call_fast_classify(text)["category"] == "registration"
+
+
+@pytest.mark.parametrize("text", [
+    "list events",
+    "How many attendees are there?",
+    "Who is going to the AI Conference?",
+])
+def test_unambiguous_info_request(text):
+    assert call_fast_classify(text)["category"] == "info_request"
+
+
+@pytest.mark.parametrize("text", [
+    # Negated or reversing intent.
+    "Don't register me for the AI Conference, jane@example.com",
+    "Please cancel my registration for Developer Meetup, sam@example.com",
+    "I can't make it, remove me from the AI Conference",
+    "Don't list events",
+    # Registration without an email or a known event.
+    "Register me for the AI Conference",
+    "Register me for the Rust Summit, jane@example.com",
+    # Info-like wording that isn't a store question.
+    "What events should I organise next year?",
+    "Show me how to write a list of attendees in Python",
+    "Which is better, meetups or conferences?",
+])
+def test_ambiguous_messages_go_to_the_models(text):
+    assert call_fast_classify(text) is None
@@ -0,0 +1,13 @@
+from bench.check_import_time import DEFAULT_BUDGET_MS, LAZY_MODULES, measure
+
+
+def test_cli_import_stays_within_budget():
+    # Best of three cold imports, to ride out a noisy machine.
+    samples = [measure("main") for _ in range(3)]
+    best_ms = min(ms for ms, _ in samples)
+    assert best_ms <= DEFAULT_BUDGET_MS, f"import main took {best_ms:.1f}ms, budget {DEFAULT_BUDGET_MS:.0f}ms"
+
+
+def test_cli_import_leaves_sdk_modules_lazy():
+    _, packages = measure("main")
+    assert not set(LAZY_MODULES) & packages
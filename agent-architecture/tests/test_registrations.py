@@ -0,0 +1,29 @@
+from stages.registration import is_bulk_registration
+from tools.registrations import EMAIL_RE, check_registrations
+
+
+def test_bulk_detection_counts_only_addresses_registration_accepts():
+    text = "Register ann@example.com, bob@example.co.uk and carl@localhost for the AI Conference"
+    found = EMAIL_RE.findall(text)
+    assert found == ["ann@example.com", "bob@example.co.uk"]
+    assert all(EMAIL_RE.fullmatch(email) for email in found)
+    assert is_bulk_registration(text)
+    assert not is_bulk_registration("Register ann@example.com and carl@localhost for the AI Conference")
+
+
+def test_check_registrations_rejects_bad_rows(store):
+    rows = [
+        {"event_name": "AI Conference", "name": "Ann", "email": "ann@example.com"},
+        {"event_name": "AI Conference", "name": "Ann again", "email": "ANN@example.com"},
+        {"event_name": "AI Conference", "name": "Jane", "email": "jane@example.com"},  # seeded
+        {"event_name": "AI Conference", "name": "Carl", "email": "carl@localhost"},
+        {"event_name": "AI Conference", "name": "Dee", "email": "dee@example.com trailing"},
+        {"event_name": "Nope", "name": "Eve", "email": "eve@example.com"},
+        {"event_name": "AI Conference", "name": "", "email": "fay@example.com"},
+    ]
+    results, accepted = check_registrations(store, rows)
+    assert [i for i, *_ in accepted] == [0]
+    assert [r and r["error"] for r in results] == [
+        None, "Already registered", "Already registered", "Invalid email", "Invalid email",
+        "Event not found", "Missing name",
+    ]
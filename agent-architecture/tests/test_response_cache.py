@@ -0,0 +1,96 @@
+import asyncio
+import threading
+
+import response_cache
+from response_cache import ResponseCache
+
+
+def _request(text):
+    return {"model": "gpt-4o-mini", "input": text}
+
+
+def test_hit_after_put():
+    cache = ResponseCache()
+    key = cache.key(_request("hi"))
+    assert cache.get(key) is None
+    cache.put(key, "hello", latency=0.5)
+    assert cache.get(key).output_text == "hello"
+    assert cache.stats["memory_hits"] == 1 and cache.stats["misses"] == 1
+
+
+def test_events_tag_change_invalidates_memory_and_disk(tmp_path):
+    tag = ["v1"]
+    cache = ResponseCache(path=str(tmp_path / "cache.db"), context_tag=lambda: tag[0])
+    old_key = cache.key(_request("list events"))
+    cache.put(old_key, "two events", latency=0.1)
+
+    tag[0] = "v2"
+    assert cache.key(_request("list events")) != old_key
+    assert cache.get(old_key) is None
+    assert cache.stats["bytes"] == 0
+    assert cache._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] == 0
+
+
+def test_disk_tier_survives_a_restart(tmp_path):
+    path = str(tmp_path / "cache.db")
+    first = ResponseCache(path=path)
+    key = first.key(_request("hi"))
+    first.put(key, "hello", latency=0.2)
+
+    second = ResponseCache(path=path)
+    assert second.get(key).output_text == "hello"
+    assert second.stats["disk_hits"] == 1
+
+
+def test_ttl_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, "time", lambda: now[0])
+    cache = ResponseCache(ttl=10)
+    key = cache.key(_request("hi"))
+    cache.put(key, "hello", latency=0.1)
+    now[0] += 9
+    assert cache.get(key) is not None
+    now[0] += 2
+    assert cache.get(key) is None
+    assert cache.stats["bytes"] == 0
+
+
+def test_lru_eviction_by_entries_and_bytes():
+    cache = ResponseCache(max_entries=2)
+    keys = [cache.key(_request(str(i))) for i in range(3)]
+    cache.put(keys[0], "a", 0)
+    cache.put(keys[1], "b", 0)
+    cache.get(keys[0])  # most recently used now
+    cache.put(keys[2], "c", 0)
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None and cache.get(keys[2]) is not None
+
+    cache = ResponseCache(max_bytes=10)
+    cache.put(keys[0], "x" * 6, 0)
+    cache.put(keys[1], "y" * 6, 0)
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[1]).output_text == "yyyyyy"
+    assert cache.stats["bytes"] == 6
+
+
+def test_async_paths_do_disk_io_off_the_event_loop(tmp_path, monkeypatch):
+    cache = ResponseCache(path=str(tmp_path / "cache.db"))
+    on_loop_thread = []
+    for name in ("_get_disk", "_put_disk", "_discard_disk"):
+        def wrapped(*args, _original=getattr(cache, name)):
+            on_loop_thread.append(threading.current_thread() is threading.main_thread())
+            return _original(*args)
+        monkeypatch.setattr(cache, name, wrapped)
+
+    async def run():
+        key = cache.key(_request("hi"))
+        assert await cache.get_async(key) is None
+        await cache.put_async(key, "hello", 0.1)
+        cache._discard_memory(key)  # force the next lookup to the disk tier
+        assert (await cache.get_async(key)).output_text == "hello"
+        await cache.discard_async(key)
+        assert await cache.get_async(key) is None
+
+    asyncio.run(run())
+    assert len(on_loop_thread) == 5 and not any(on_loop_thread)
+    assert cache.stats["disk_hits"] == 1 and cache.stats["misses"] == 2
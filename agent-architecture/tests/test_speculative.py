@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+import pipeline
+
+COUNT_QUERY = {"query_type": "count_attendees", "statistics": {"total_events": 0, "total_attendees": 0, "events": []}}
+
+
+class Stages:
+    """Stub model stages with controllable delays; records cancellations."""
+
+    def __init__(self, monkeypatch, valid=True, validate_delay=0.0, categorize_delay=0.0, category_error=None):
+        self.cancelled = []
+        self.writes = []
+
+        async def stage(name, delay, result):
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                self.cancelled.append(name)
+                raise
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        monkeypatch.setattr(pipeline, "call_validate_input_async",
+                            lambda text: stage("validate", validate_delay, {"valid": valid, "reason": ""}))
+        monkeypatch.setattr(pipeline, "call_categorize_async",
+                            lambda text, ctx: stage("categorize", categorize_delay, category_error
+                                                    or {"category": "info_request", "confidence": 0.95}))
+        monkeypatch.setattr(pipeline, "extract_for_route",
+                            lambda text, category, ctx: stage("route", 0.05, dict(COUNT_QUERY)))
+        monkeypatch.setattr(pipeline, "apply_route", lambda category, extracted: self.writes.append(extracted) or extracted)
+
+
+def _run(text="how many attendees?"):
+    return asyncio.run(pipeline.run_pipeline(text, speculative=True, fast_path=False, mode="chained"))
+
+
+def test_all_stages_used_when_validation_passes(monkeypatch):
+    stages = Stages(monkeypatch, validate_delay=0.02)
+    outcome = _run()
+    assert outcome["status"] == "ok"
+    assert outcome["discarded"] == []
+    assert len(stages.writes) == 1
+
+
+def test_early_invalid_cancels_categorization(monkeypatch):
+    stages = Stages(monkeypatch, valid=False, categorize_delay=1.0)
+    outcome = _run()
+    assert outcome["status"] == "invalid"
+    assert outcome["discarded"] == ["categorize"]
+    assert stages.cancelled == ["categorize"]
+
+
+def test_late_invalid_discards_extraction_without_writing(monkeypatch):
+    stages = Stages(monkeypatch, valid=False, validate_delay=0.02)
+    outcome = _run()
+    assert outcome["status"] == "invalid"
+    assert "route" in outcome["discarded"]
+    assert stages.writes == []
+
+
+def test_failed_categorization_cancels_validation(monkeypatch):
+    stages = Stages(monkeypatch, validate_delay=1.0, categorize_delay=0.01, category_error=RuntimeError("boom"))
+
+    async def run():
+        outcome = pipeline._new_outcome()
+        with pytest.raises(RuntimeError):
+            await pipeline._run_speculative("how many attendees?", outcome, None)
+        await asyncio.sleep(0)  # let the cancellation land
+        return outcome
+
+    outcome = asyncio.run(run())
+    assert outcome["discarded"] == ["validate"]
+    assert stages.cancelled == ["validate"]
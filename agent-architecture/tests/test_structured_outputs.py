@@ -0,0 +1,81 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import llm_client
+import schemas
+from response_cache import ResponseCache
+
+SCHEMA = schemas.register("test_extraction", {
+    "type": "object",
+    "properties": {
+        "name": {"type": "string", "minLength": 1},
+        "kind": {"type": "string", "enum": ["a", "b"]},
+        "score": {"type": "number", "minimum": 0, "maximum": 1},
+        "tags": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["name", "kind", "score", "tags"],
+    "additionalProperties": False,
+})
+VALID = {"name": "x", "kind": "a", "score": 0.5, "tags": []}
+
+
+@pytest.mark.parametrize("value", [
+    {**VALID, "kind": "c"},
+    {**VALID, "score": 2},
+    {**VALID, "name": ""},
+    {**VALID, "tags": [1]},
+    {**VALID, "extra": True},
+    {k: v for k, v in VALID.items() if k != "name"},
+])
+def test_schema_rejects_invalid_values(value):
+    with pytest.raises(schemas.SchemaError):
+        schemas.parse("test_extraction", json.dumps(value))
+
+
+def test_schema_accepts_valid_value():
+    assert schemas.parse("test_extraction", json.dumps(VALID)) == VALID
+
+
+@pytest.fixture
+def replies(monkeypatch):
+    """Queue of raw model replies served to create_response, and the requests it got."""
+    queue, requests = [], []
+
+    def create_response(**request):
+        requests.append(request)
+        return SimpleNamespace(output_text=queue.pop(0), usage=None)
+
+    monkeypatch.setattr(llm_client.clients, "create_response", create_response)
+    monkeypatch.setattr(llm_client, "_response_cache", ResponseCache())
+    return queue, requests
+
+
+def _request():
+    return {
+        "model": "gpt-4o-mini",
+        "input": [{"role": "user", "content": "extract"}],
+        "text": {"format": {"type": "json_schema", "name": "test_extraction", "schema": SCHEMA, "strict": True}},
+    }
+
+
+def test_invalid_reply_is_repaired_once(replies):
+    queue, requests = replies
+    queue += ['{"name": "x"}', json.dumps(VALID)]
+    assert llm_client.create_structured(**_request()) == VALID
+    assert len(requests) == 2
+    # The repair call shows the model its reply and the error.
+    assert requests[1]["input"][-2] == {"role": "assistant", "content": '{"name": "x"}'}
+    assert "did not match" in requests[1]["input"][-1]["content"]
+    # The bad reply is not served from the cache next time.
+    assert llm_client.get_response_cache().get(llm_client.get_response_cache().key(_request())) is None
+
+
+def test_second_failure_raises(replies):
+    queue, requests = replies
+    queue += ["not json", '{"name": "x"}']
+    with pytest.raises(schemas.SchemaError):
+        llm_client.create_structured(**_request())
+    assert len(requests) == 2
+    assert llm_client.get_response_cache().stats["bytes"] == 0
@@ -0,0 +1,109 @@
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+from tool_engine import ToolRegistry, function_call_output, run_tool_loop
+
+
+def _call(name, arguments="{}", call_id=None):
+    return {"type": "function_call", "call_id": call_id or f"call_{name}", "name": name, "arguments": arguments}
+
+
+def _registry(**options):
+    registry = ToolRegistry(**options)
+    registry.register("echo", lambda value: value, "Echo", {"type": "object"})
+    return registry
+
+
+def test_calls_run_in_parallel():
+    registry = ToolRegistry()
+    barrier = threading.Barrier(3, timeout=2)
+
+    def wait(n):
+        barrier.wait()  # only passes if all three calls run at once
+        return n
+
+    registry.register("wait", wait, "Wait", {"type": "object"})
+    calls = [_call("wait", json.dumps({"n": n}), f"c{n}") for n in range(3)]
+    assert registry.run_calls(calls) == [0, 1, 2]
+
+
+def test_per_tool_timeout():
+    registry = _registry()
+    registry.register("slow", lambda: time.sleep(1), "Slow", {"type": "object"}, timeout=0.05)
+    started = time.monotonic()
+    results = registry.run_calls([_call("slow"), _call("echo", '{"value": 1}')])
+    assert results[0] == {"error": "slow timed out after 0.05s"}
+    assert results[1] == 1
+    assert time.monotonic() - started < 0.5
+
+
+def test_exclusive_timeout_starts_after_the_lock():
+    registry = ToolRegistry()
+    registry.register("write", lambda: time.sleep(0.1) or "ok", "Write", {"type": "object"},
+                      timeout=0.15, exclusive=True)
+    # Back to back the second write finishes after 0.2s, past its 0.15s
+    # timeout if that counted the wait for the first one's lock.
+    assert registry.run_calls([_call("write", call_id="a"), _call("write", call_id="b")]) == ["ok", "ok"]
+
+
+def test_exclusive_timeout_is_reported_as_still_running():
+    registry = ToolRegistry()
+    registry.register("write", lambda: time.sleep(0.3), "Write", {"type": "object"}, timeout=0.05, exclusive=True)
+    [result] = registry.run_calls([_call("write")])
+    assert result["status"] == "still_running"
+    assert "do not retry" in result["error"]
+
+
+def test_unknown_tool():
+    registry = _registry()
+    results = registry.run_calls([_call("missing"), _call("echo", '{"value": "x"}')])
+    assert results == [{"error": "Unknown tool: missing"}, "x"]
+
+
+def test_invalid_arguments_and_exceptions():
+    registry = _registry()
+    registry.register("fail", lambda: 1 / 0, "Fail", {"type": "object"})
+    results = registry.run_calls([_call("echo", "{not json"), _call("fail")])
+    assert results == [{"error": "Arguments are not valid JSON"}, {"error": "ZeroDivisionError: division by zero"}]
+
+
+def test_function_call_output_pairs_with_its_call():
+    output = function_call_output(_call("echo", call_id="call_7"), {"a": 1})
+    assert output == {"type": "function_call_output", "call_id": "call_7", "output": '{"a": 1}'}
+
+
+class _ToolCallingClient:
+    """Responses stub that keeps calling `echo` until tool_choice="none"."""
+
+    def __init__(self):
+        self.requests = []
+        self.responses = SimpleNamespace(create=self.create)
+
+    def create(self, **request):
+        self.requests.append(request)
+        usage = SimpleNamespace(input_tokens=10, output_tokens=1)
+        if request.get("tool_choice") == "none":
+            return SimpleNamespace(output=[], output_text="done", usage=usage)
+        n = len(self.requests)
+        item = SimpleNamespace(type="function_call", call_id=f"call_{n}", name="echo",
+                               arguments=json.dumps({"value": n}))
+        return SimpleNamespace(output=[item], output_text="", usage=usage)
+
+
+def test_tool_loop_stops_at_the_iteration_cap():
+    client = _ToolCallingClient()
+    loop = run_tool_loop(client, _registry(), [{"role": "user", "content": "hi"}], max_iterations=2, model="m")
+
+    assert loop["response"].output_text == "done"
+    assert loop["iterations"] == 3
+    assert loop["input_tokens"] == 30
+    assert [r.get("tool_choice") for r in client.requests] == [None, None, "none"]
+    assert [result for _, result in loop["calls"]] == [1, 2]
+
+    # Every function_call sent back is followed by the output with its call_id.
+    items = client.requests[-1]["input"][1:]
+    assert [item["type"] for item in items] == ["function_call", "function_call_output"] * 2
+    for call, output in zip(items[::2], items[1::2]):
+        assert output["call_id"] == call["call_id"]
@@ -0,0 +1,270 @@
+"""
+Tool execution engine for function-calling loops.
+
+A ToolRegistry maps tool names to Python functions and their JSON schemas.
+run_tool_loop() sends a request, runs every function_call in the response
+concurrently on a thread pool, sends the results back as
+function_call_output items and repeats until the model answers without
+calling a tool (or max_iterations is reached).
+
+Each call has its own timeout, counted from when it starts running (not
+while it waits for a pool worker or an exclusive tool's lock). A call that
+times out or raises is reported to the model as {"error": ...} in its
+output rather than failing the whole loop. Python threads cannot be killed,
+so a timed-out call keeps running in the background; its result is just no
+longer waited for. Exclusive tools are the ones that write, so their
+timeouts are reported as still running, with a request not to retry, since
+the write may still land.
+
+Tool results go back into the conversation, so their size is input tokens
+on every later call. Tools should return deltas and pages (see paginate())
+rather than whole tables; check_result_size() records the serialized size
+of every result in `result_sizes` and replaces results over the cap with an
+error asking for a smaller page.
+"""
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from tracing import span
+
+DEFAULT_TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "10"))
+DEFAULT_MAX_TOOL_ITERATIONS = int(os.getenv("MAX_TOOL_ITERATIONS", "5"))
+MAX_TOOL_WORKERS = int(os.getenv("MAX_TOOL_WORKERS", "8"))
+MAX_TOOL_RESULT_BYTES = int(os.getenv("MAX_TOOL_RESULT_BYTES", "4000"))
+DEFAULT_PAGE_SIZE = int(os.getenv("TOOL_PAGE_SIZE", "20"))
+
+# Serialized tool result sizes, per tool name.
+result_sizes = defaultdict(lambda: {"calls": 0, "bytes": 0, "max_bytes": 0, "over_cap": 0})
+
+
+def paginate(rows: list, cursor: str = None, limit: int = DEFAULT_PAGE_SIZE,
+             max_bytes: int = MAX_TOOL_RESULT_BYTES) -> dict:
+    """
+    One page of `rows` (dicts with increasing "id"s) after `cursor`.
+
+    The page ends early if it would serialize to more than max_bytes.
+    The cursor is the last id returned, so pages stay stable while rows are
+    appended.
+
+    Returns:
+        dict with "items", "count" (all rows) and "next_cursor" (pass it
+        back for the next page; None on the last page).
+    """
+    after = int(cursor) if cursor else None
+    remaining = [row for row in rows if after is None or row["id"] > after]
+    items = []
+    size = 64  # the envelope
+    for row in remaining[:max(1, limit)]:
+        size += len(json.dumps(row)) + 2
+        if items and size > max_bytes:
+            break
+        items.append(row)
+    more = len(items) < len(remaining)
+    return {"items": items, "count": len(rows), "next_cursor": str(items[-1]["id"]) if more else None}
+
+
+def check_result_size(name: str, result, max_bytes: int = MAX_TOOL_RESULT_BYTES):
+    """
+    Record the serialized size of a tool result.
+
+    Returns:
+        (result, size in bytes); the result is replaced by an {"error": ...}
+        when it is over max_bytes.
+    """
+    size = len(json.dumps(result).encode())
+    stats = result_sizes[name]
+    stats["calls"] += 1
+    stats["bytes"] += size
+    stats["max_bytes"] = max(stats["max_bytes"], size)
+    if size > max_bytes:
+        stats["over_cap"] += 1
+        return {"error": f"Result is {size:,} bytes, over the {max_bytes:,} byte cap; request a smaller page"}, size
+    return result, size
+
+
+class _CallStart:
+    """When a submitted call started running, or that it was given up before it did."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = threading.Event()
+        self.started_at = None
+        self.abandoned = False
+
+    def start(self) -> bool:
+        with self._lock:
+            if self.abandoned:
+                return False
+            self.started_at = time.monotonic()
+            self.started.set()
+            return True
+
+    def abandon(self) -> bool:
+        """Give up on a call that has not started; False if it already has."""
+        with self._lock:
+            if self.started.is_set():
+                return False
+            self.abandoned = True
+            return True
+
+
+class ToolRegistry:
+    """
+    Tools available to the model, by name.
+
+    Tools registered with exclusive=True (e.g. ones that write to shared
+    tables) run one at a time; all others run in parallel.
+    """
+
+    def __init__(self, default_timeout: float = DEFAULT_TOOL_TIMEOUT, max_result_bytes: int = MAX_TOOL_RESULT_BYTES):
+        self.default_timeout = default_timeout
+        self.max_result_bytes = max_result_bytes
+        self.tools = {}
+        self._exclusive = threading.Lock()
+
+    def register(self, name: str, fn, description: str, parameters: dict, timeout: float = None,
+                 exclusive: bool = False):
+        """Register `fn`; it is called with the model's arguments as keyword arguments."""
+        self.tools[name] = {
+            "fn": fn,
+            "timeout": self.default_timeout if timeout is None else timeout,
+            "exclusive": exclusive,
+            "definition": {"type": "function", "name": name, "description": description, "parameters": parameters},
+        }
+        return fn
+
+    def tool(self, name: str, description: str, parameters: dict, **options):
+        """Decorator form of register()."""
+        def decorate(fn):
+            return self.register(name, fn, description, parameters, **options)
+        return decorate
+
+    def definitions(self) -> list:
+        """The `tools` list for a Responses API request."""
+        return [tool["definition"] for tool in self.tools.values()]
+
+    def run_calls(self, calls: list) -> list:
+        """
+        Run function_call items concurrently.
+
+        Returns:
+            list of results (any JSON-serializable value, or {"error": ...}),
+            one per call, in the order of `calls`.
+        """
+        if not calls:
+            return []
+        # Unknown tools are answered right away and never reach the pool.
+        results = [None if call["name"] in self.tools else {"error": f"Unknown tool: {call['name']}"} for call in calls]
+        known = [(i, call) for i, call in enumerate(calls) if results[i] is None]
+        if not known:
+            return results
+        executor = ThreadPoolExecutor(max_workers=min(MAX_TOOL_WORKERS, len(known)))
+        try:
+            # Waiting to start (for a worker or an exclusive lock) is bounded by
+            # running every call back to back; each call's own timeout only
+            # starts once it runs.
+            start_deadline = time.monotonic() + sum(self.tools[call["name"]]["timeout"] for _, call in known)
+            submitted = []
+            for i, call in known:
+                start = _CallStart()
+                future = executor.submit(
+                    contextvars.copy_context().run, self._invoke, call["name"], call["arguments"], start
+                )
+                submitted.append((i, call, start, future))
+            for i, call, start, future in submitted:
+                name, tool = call["name"], self.tools[call["name"]]
+                if not start.started.wait(max(0.0, start_deadline - time.monotonic())) and start.abandon():
+                    results[i] = {"error": f"{name} did not start in time and was not run"}
+                    continue
+                try:
+                    results[i] = future.result(timeout=max(0.0, start.started_at + tool["timeout"] - time.monotonic()))
+                except FutureTimeoutError:
+                    if tool["exclusive"]:
+                        results[i] = {
+                            "status": "still_running",
+                            "error": f"{name} is still running after {tool['timeout']:g}s and its changes may "
+                                     "still be applied; do not retry it",
+                        }
+                    else:
+                        results[i] = {"error": f"{name} timed out after {tool['timeout']:g}s"}
+            return results
+        finally:
+            # Don't block on calls that timed out.
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _invoke(self, name: str, arguments: str, start: _CallStart = None):
+        tool = self.tools[name]
+        start = start or _CallStart()
+        try:
+            kwargs = json.loads(arguments or "{}")
+        except ValueError:
+            start.start()
+            return {"error": "Arguments are not valid JSON"}
+        with span(f"tool.{name}", arguments=arguments) as s:
+            try:
+                with self._exclusive if tool["exclusive"] else contextlib.nullcontext():
+                    if not start.start():
+                        s.set(error="not started")
+                        return {"error": f"{name} did not start in time and was not run"}
+                    result = tool["fn"](**kwargs)
+            except Exception as exc:
+                s.set(error=f"{type(exc).__name__}: {exc}")
+                return {"error": f"{type(exc).__name__}: {exc}"}
+            result, size = check_result_size(name, result, self.max_result_bytes)
+            s.set(result_bytes=size)
+            return result
+
+
+def function_call_item(item) -> dict:
+    """A response's function_call output item as a plain input item."""
+    return {"type": "function_call", "call_id": item.call_id, "name": item.name, "arguments": item.arguments}
+
+
+def function_call_output(call: dict, result) -> dict:
+    return {"type": "function_call_output", "call_id": call["call_id"], "output": json.dumps(result)}
+
+
+def run_tool_loop(client, registry: ToolRegistry, input: list, max_iterations: int = DEFAULT_MAX_TOOL_ITERATIONS,
+                  **request) -> dict:
+    """
+    Call the model, execute its tool calls and feed the results back until it answers.
+
+    If the model is still calling tools after `max_iterations` rounds, one
+    last request is sent with tool_choice="none" so it has to answer with
+    what it has.
+
+    Returns:
+        dict with "response" (the final response), "calls" (list of
+        (function_call item, result) pairs in execution order),
+        "iterations" (model calls made) and "input_tokens" (summed over
+        those calls, as reported by the API).
+    """
+    items = list(input)
+    calls_made = []
+    input_tokens = 0
+    iterations = 0
+    tools = registry.definitions()
+    with span("tool.loop") as s:
+        while True:
+            final_round = iterations >= max_iterations
+            extra = {"tool_choice": "none"} if final_round else {}
+            response = client.responses.create(input=items, tools=tools, **extra, **request)
+            iterations += 1
+            if response.usage:
+                input_tokens += response.usage.input_tokens
+
+            calls = [function_call_item(item) for item in response.output if item.type == "function_call"]
+            if not calls or final_round:
+                break
+            results = registry.run_calls(calls)
+            items += calls
+            items += [function_call_output(call, result) for call, result in zip(calls, results)]
+            calls_made += zip(calls, results)
+        s.set(iterations=iterations, tool_calls=len(calls_made))
+    return {"response": response, "calls": calls_made, "iterations": iterations, "input_tokens": input_tokens}
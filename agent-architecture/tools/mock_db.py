@@ -1,27 +1,250 @@
-EVENTS = [
+"""
+Event store used by the tools and stages.
+
+Two backends share one interface (events, attendees, count_attendees,
+attendee_counts, add_event, get_event, get_event_by_id, find_by_email,
+search_attendees, list_attendees, add_attendee, add_attendees,
+remove_attendee, events_context, flush, events_version, events_tag):
+
+- EventStore: in-memory id-keyed tables with hash/trigram indexes (the default,
+  and what tests and benchmarks use)
+- tools.sqlite_store.SqliteEventStore: a SQLite file, persistent and
+  shared across worker processes
+
+Both keep per-event attendee counters up to date on every insert and
+removal, so counts and overviews cost O(events) rather than a scan of the
+attendees; check_attendee_counts() verifies them against a full recount.
+
+EVENT_STORE=sqlite selects the SQLite backend, at EVENT_STORE_PATH
+(default events.db).
+"""
+import hashlib
+import os
+
+from tools.registrations import batch_summary, check_registrations
+from tools.search_index import TrigramIndex
+
+
+class EventStore:
+    """
+    In-memory events/attendees tables with hash indexes.
+
+    Indexes are maintained on every insert so lookups by event name, event id
+    and attendee email, and listing an event's attendees, never scan the
+    full tables. Attendee ids come from a monotonic sequence instead of
+    max() over the table. Names and emails are also kept in trigram indexes
+    for case-insensitive substring search, and attendees are counted per
+    event as they are added and removed.
+    """
+
+    def __init__(self, events=(), attendees=()):
+        self.events = []
+        self._events_by_name = {}      # casefolded name -> event
+        self._events_by_id = {}        # id -> event
+        # Attendee tables are id-keyed dicts: insertion (registration) order
+        # for listing, O(1) removal.
+        self._attendees_by_id = {}     # id -> attendee
+        self._attendees_by_email = {}  # casefolded email -> {id: attendee}
+        self._attendees_by_event = {}  # event_id -> {id: attendee}
+        self._attendee_counts = {}     # event_id -> number of attendees
+        self._name_index = TrigramIndex()
+        self._email_index = TrigramIndex()
+        self._next_event_id = 1
+        self._next_attendee_id = 1
+        self.events_version = 0  # bumped on every event change
+        self.events_tag = ""     # fingerprint of events_context(), stable across restarts
+        self._events_context = ""
+
+        for event in events:
+            self.add_event(event["name"], event["id"])
+        for attendee in attendees:
+            self._insert_attendee(dict(attendee))
+
+    @property
+    def attendees(self):
+        """All attendees, in registration order (a copy)."""
+        return list(self._attendees_by_id.values())
+
+    def count_attendees(self):
+        return len(self._attendees_by_id)
+
+    def attendee_counts(self):
+        """Number of attendees per event id (every event, including empty ones)."""
+        return dict(self._attendee_counts)
+
+    def add_event(self, name, event_id=None):
+        """Add an event; raises ValueError if its name (any case) or id is taken."""
+        if event_id is None:
+            event_id = self._next_event_id
+        if name.casefold() in self._events_by_name or event_id in self._events_by_id:
+            raise ValueError(f"Event already exists: {name}")
+        event = {"id": event_id, "name": name}
+        self.events.append(event)
+        self._events_by_name[name.casefold()] = event
+        self._events_by_id[event_id] = event
+        self._attendees_by_event.setdefault(event_id, {})
+        self._attendee_counts.setdefault(event_id, 0)
+        self._next_event_id = max(self._next_event_id, event_id + 1)
+        self.events_version += 1
+        self._events_context = "\n".join(f"{e['id']}: {e['name']}" for e in self.events)
+        self.events_tag = hashlib.sha1(self._events_context.encode()).hexdigest()[:12]
+        return event
+
+    def get_event(self, event_name):
+        return self._events_by_name.get(event_name.casefold())
+
+    def get_event_by_id(self, event_id):
+        return self._events_by_id.get(event_id)
+
+    def find_by_email(self, email):
+        """Exact (case-insensitive) email lookup across all events."""
+        return list(self._attendees_by_email.get(email.casefold(), {}).values())
+
+    def search_attendees(self, field, query, limit=None):
+        """
+        Case-insensitive substring search on attendee "name" or "email".
+
+        Returns up to `limit` dicts with name, email and the event name
+        already joined, in registration order.
+        """
+        index = self._name_index if field == "name" else self._email_index
+        results = []
+        for attendee_id in index.search(query, limit):
+            attendee = self._attendees_by_id[attendee_id]
+            event = self._events_by_id.get(attendee["event_id"])
+            if event:
+                results.append({"name": attendee["name"], "email": attendee["email"], "event": event["name"]})
+        return results
+
+    def list_attendees(self, event_name):
+        event = self.get_event(event_name)
+        if not event:
+            return []
+        return list(self._attendees_by_event[event["id"]].values())
+
+    def add_attendee(self, event_name, name, email):
+        event = self.get_event(event_name)
+        if not event:
+            return {"error": "Event not found"}
+        new_attendee = {"id": self._next_attendee_id, "event_id": event["id"], "name": name, "email": email}
+        self._insert_attendee(new_attendee)
+        return new_attendee
+
+    def add_attendees(self, rows):
+        """
+        Register many {event_name, name, email} rows at once.
+
+        Every row is validated before anything is inserted; valid rows are
+        inserted together and invalid ones reported. Returns {"batch":
+        per-row results, "registered": n, "rejected": n}.
+        """
+        results, accepted = check_registrations(self, rows)
+        for i, event, name, email in accepted:
+            attendee = {"id": self._next_attendee_id, "event_id": event["id"], "name": name, "email": email}
+            self._insert_attendee(attendee)
+            results[i] = {"status": "registered", **attendee}
+        return batch_summary(results)
+
+    def remove_attendee(self, attendee_id):
+        """Unregister an attendee by id; returns the removed row, or an error."""
+        attendee = self._attendees_by_id.pop(attendee_id, None)
+        if attendee is None:
+            return {"error": "Attendee not found"}
+        by_email = self._attendees_by_email[attendee["email"].casefold()]
+        del by_email[attendee_id]
+        if not by_email:
+            del self._attendees_by_email[attendee["email"].casefold()]
+        del self._attendees_by_event[attendee["event_id"]][attendee_id]
+        self._attendee_counts[attendee["event_id"]] -= 1
+        self._name_index.remove(attendee_id)
+        self._email_index.remove(attendee_id)
+        return attendee
+
+    def events_context(self):
+        """Rendered events list, rebuilt only when events change (see events_version)."""
+        return self._events_context
+
+    def flush(self):
+        """Nothing to persist; kept for parity with SqliteEventStore."""
+
+    def _insert_attendee(self, attendee):
+        self._attendees_by_id[attendee["id"]] = attendee
+        self._attendees_by_email.setdefault(attendee["email"].casefold(), {})[attendee["id"]] = attendee
+        self._attendees_by_event.setdefault(attendee["event_id"], {})[attendee["id"]] = attendee
+        self._attendee_counts[attendee["event_id"]] = self._attendee_counts.get(attendee["event_id"], 0) + 1
+        self._name_index.add(attendee["id"], attendee["name"])
+        self._email_index.add(attendee["id"], attendee["email"])
+        self._next_attendee_id = max(self._next_attendee_id, attendee["id"] + 1)
+
+
+SEED_EVENTS = [
     {"id": 1, "name": "Developer Meetup"},
     {"id": 2, "name": "AI Conference"},
 ]
 
-ATTENDEES = [
+SEED_ATTENDEES = [
     {"id": 1, "event_id": 1, "name": "John Doe", "email": "john@example.com"},
     {"id": 2, "event_id": 2, "name": "Jane Smith", "email": "jane@example.com"},
 ]
 
+
+def check_attendee_counts(store):
+    """
+    Compare a store's maintained attendee counters with a full recount.
+
+    Returns:
+        list of mismatch descriptions; empty when the counters are right.
+    """
+    attendees = store.attendees
+    recount = {}
+    for attendee in attendees:
+        recount[attendee["event_id"]] = recount.get(attendee["event_id"], 0) + 1
+    counts = store.attendee_counts()
+    mismatches = []
+    for event in store.events:
+        counted, recounted = counts.get(event["id"], 0), recount.get(event["id"], 0)
+        if counted != recounted:
+            mismatches.append(f"{event['name']}: counter says {counted}, recount {recounted}")
+    if store.count_attendees() != len(attendees):
+        mismatches.append(f"total: counter says {store.count_attendees()}, recount {len(attendees)}")
+    return mismatches
+
+
+def open_store(backend="memory", path="events.db"):
+    """Create the store for `backend` ("memory" or "sqlite"), seeded when empty."""
+    if backend == "memory":
+        return EventStore(events=SEED_EVENTS, attendees=SEED_ATTENDEES)
+    if backend == "sqlite":
+        from tools.sqlite_store import SqliteEventStore
+        return SqliteEventStore(path, events=SEED_EVENTS, attendees=SEED_ATTENDEES)
+    raise ValueError(f"Unknown event store backend: {backend}")
+
+
+store = open_store(os.getenv("EVENT_STORE", "memory"), os.getenv("EVENT_STORE_PATH", "events.db"))
+
+
+def __getattr__(name):
+    # EVENTS / ATTENDEES: the raw tables, for read-only callers. Resolved on
+    # access, so importing this module never loads a SQLite table into memory.
+    # Writes must go through `store` or the functions below.
+    if name == "EVENTS":
+        return store.events
+    if name == "ATTENDEES":
+        return store.attendees
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 def get_events_context():
-    return "\n".join(f"{e['id']}: {e['name']}" for e in EVENTS)
+    return store.events_context()
 
 def list_attendees(event_name):
-    event = next((e for e in EVENTS if e["name"].lower() == event_name.lower()), None)
-    if not event:
-        return []
-    return [a for a in ATTENDEES if a["event_id"] == event["id"]]
+    return store.list_attendees(event_name)
 
 def add_attendee(event_name, name, email):
-    event = next((e for e in EVENTS if e["name"].lower() == event_name.lower()), None)
-    if not event:
-        return {"error": "Event not found"}
-    new_id = max(a["id"] for a in ATTENDEES) + 1
-    new_attendee = {"id": new_id, "event_id": event["id"], "name": name, "email": email}
-    ATTENDEES.append(new_attendee)
-    return new_attendee
+    return store.add_attendee(event_name, name, email)
+
+def add_attendees(rows):
+    return store.add_attendees(rows)
+
+def remove_attendee(attendee_id):
+    return store.remove_attendee(attendee_id)
@@ -0,0 +1,50 @@
+import re
+
+# One email address. Unanchored, for finding addresses in messages; use
+# EMAIL_RE.fullmatch() to check a single field.
+EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+
+
+def check_registrations(store, rows):
+    """
+    Validate a batch of {event_name, name, email} rows before any insert.
+
+    A row is rejected when its event is unknown, its name is empty, its
+    email is malformed, or the email is already registered for that event
+    (earlier in the batch or in the store).
+
+    Returns:
+        (results, accepted): `results` has one entry per row, with the
+        rejected ones already filled in as {"status": "rejected", "error",
+        "event_name", "name", "email"} and None for the rest; `accepted`
+        lists (row index, event, name, email) to insert.
+    """
+    results = [None] * len(rows)
+    accepted = []
+    seen = set()
+    for i, row in enumerate(rows):
+        event_name = (row.get("event_name") or "").strip()
+        name = (row.get("name") or "").strip()
+        email = (row.get("email") or "").strip()
+        event = store.get_event(event_name)
+        key = (event["id"] if event else None, email.casefold())
+        if not event:
+            error = "Event not found"
+        elif not name:
+            error = "Missing name"
+        elif not EMAIL_RE.fullmatch(email):
+            error = "Invalid email"
+        elif key in seen or any(a["event_id"] == event["id"] for a in store.find_by_email(email)):
+            error = "Already registered"
+        else:
+            seen.add(key)
+            accepted.append((i, event, name, email))
+            continue
+        results[i] = {"status": "rejected", "error": error, "event_name": event_name, "name": name, "email": email}
+    return results, accepted
+
+
+def batch_summary(results) -> dict:
+    """Shape returned by add_attendees: per-row results plus counts."""
+    registered = sum(1 for r in results if r["status"] == "registered")
+    return {"batch": results, "registered": registered, "rejected": len(results) - registered}
@@ -0,0 +1,64 @@
+class TrigramIndex:
+    """
+    Case-insensitive substring index over short strings (names, emails).
+
+    Every document is split into its character trigrams; a query is answered
+    by intersecting the posting lists of the query's trigrams and then
+    confirming the substring match on the few candidates left. Queries
+    shorter than three characters fall back to scanning the documents.
+    """
+
+    def __init__(self):
+        self._texts = {}     # doc_id -> casefolded text
+        self._postings = {}  # trigram -> {doc_id: None}, in insertion order
+        self._in_order = True  # ids have been added in ascending order
+        self._last_id = None
+
+    def add(self, doc_id, text):
+        text = text.casefold()
+        if self._last_id is not None and doc_id < self._last_id:
+            self._in_order = False
+        self._last_id = doc_id if self._last_id is None else max(self._last_id, doc_id)
+        self._texts[doc_id] = text
+        for gram in _trigrams(text):
+            self._postings.setdefault(gram, {})[doc_id] = None
+
+    def remove(self, doc_id):
+        text = self._texts.pop(doc_id, None)
+        if text is None:
+            return
+        for gram in _trigrams(text):
+            postings = self._postings.get(gram)
+            if postings is not None:
+                postings.pop(doc_id, None)
+
+    def search(self, query, limit=None):
+        """
+        Return ids of documents containing `query`, in ascending id order.
+
+        The smallest posting list is walked in id order and the walk stops
+        as soon as `limit` matches are found, so a limited search over a
+        common trigram does not touch every posting.
+        """
+        query = query.casefold()
+        if not query:
+            return []
+
+        grams = _trigrams(query)
+        if grams:
+            postings = sorted((self._postings.get(g, {}) for g in grams), key=len)
+            smallest, others = postings[0], postings[1:]
+        else:
+            smallest, others = self._texts, []
+
+        matches = []
+        for doc_id in smallest if self._in_order else sorted(smallest):
+            if all(doc_id in other for other in others) and query in self._texts[doc_id]:
+                matches.append(doc_id)
+                if limit is not None and len(matches) >= limit:
+                    break
+        return matches
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
@@ -0,0 +1,320 @@
+import atexit
+import hashlib
+import sqlite3
+import threading
+
+from tools.registrations import batch_summary, check_registrations
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS events_name ON events (name COLLATE NOCASE);
+CREATE TABLE IF NOT EXISTS attendees (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    event_id INTEGER NOT NULL REFERENCES events (id),
+    name TEXT NOT NULL,
+    email TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS attendees_email ON attendees (email COLLATE NOCASE);
+-- Covering, so listing an event's attendees never touches the table.
+CREATE INDEX IF NOT EXISTS attendees_event ON attendees (event_id, id, name, email);
+-- Attendees per event, kept in step by triggers so counts never scan attendees.
+CREATE TABLE IF NOT EXISTS event_counts (
+    event_id INTEGER PRIMARY KEY REFERENCES events (id),
+    attendees INTEGER NOT NULL DEFAULT 0
+);
+CREATE TRIGGER IF NOT EXISTS event_counts_event AFTER INSERT ON events BEGIN
+    INSERT OR IGNORE INTO event_counts (event_id, attendees) VALUES (new.id, 0);
+END;
+CREATE TRIGGER IF NOT EXISTS event_counts_insert AFTER INSERT ON attendees BEGIN
+    UPDATE event_counts SET attendees = attendees + 1 WHERE event_id = new.event_id;
+END;
+CREATE TRIGGER IF NOT EXISTS event_counts_delete AFTER DELETE ON attendees BEGIN
+    UPDATE event_counts SET attendees = attendees - 1 WHERE event_id = old.event_id;
+END;
+"""
+
+# For databases created before event_counts existed.
+BACKFILL_COUNTS = """
+INSERT OR REPLACE INTO event_counts (event_id, attendees)
+SELECT e.id, (SELECT COUNT(*) FROM attendees a WHERE a.event_id = e.id) FROM events e
+"""
+
+# Trigram full-text index for substring search on names and emails, kept in
+# step by a trigger (needs SQLite 3.34+; without it search falls back to LIKE).
+SEARCH_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS attendees_fts USING fts5(
+    name, email, content='attendees', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS attendees_fts_insert AFTER INSERT ON attendees BEGIN
+    INSERT INTO attendees_fts (rowid, name, email) VALUES (new.id, new.name, new.email);
+END;
+CREATE TRIGGER IF NOT EXISTS attendees_fts_delete AFTER DELETE ON attendees BEGIN
+    INSERT INTO attendees_fts (attendees_fts, rowid, name, email) VALUES ('delete', old.id, old.name, old.email);
+END;
+"""
+
+# Constant SQL text, so sqlite3's per-connection statement cache keeps every
+# query prepared after its first use.
+INSERT_EVENT = "INSERT INTO events (id, name) VALUES (?, ?)"
+INSERT_ATTENDEE = "INSERT INTO attendees (id, event_id, name, email) VALUES (?, ?, ?, ?)"
+SELECT_EVENTS = "SELECT id, name FROM events ORDER BY id"
+SELECT_ATTENDEES = "SELECT id, event_id, name, email FROM attendees ORDER BY id"
+SELECT_BY_EVENT = "SELECT id, event_id, name, email FROM attendees WHERE event_id = ? ORDER BY id"
+SELECT_BY_EMAIL = "SELECT id, event_id, name, email FROM attendees WHERE email = ? COLLATE NOCASE ORDER BY id"
+DELETE_ATTENDEE = "DELETE FROM attendees WHERE id = ?"
+SELECT_ATTENDEE = "SELECT id, event_id, name, email FROM attendees WHERE id = ?"
+COUNT_ATTENDEES = "SELECT COALESCE(SUM(attendees), 0) FROM event_counts"
+SELECT_COUNTS = "SELECT event_id, attendees FROM event_counts"
+HAS_COUNTS = "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'event_counts'"
+SEARCH_FTS = (
+    "SELECT a.name, a.email, e.name FROM attendees_fts JOIN attendees a ON a.id = attendees_fts.rowid "
+    "JOIN events e ON e.id = a.event_id WHERE attendees_fts MATCH ? ORDER BY a.id LIMIT ?"
+)
+SEARCH_LIKE = {
+    "name": (
+        "SELECT a.name, a.email, e.name FROM attendees a JOIN events e ON e.id = a.event_id "
+        "WHERE a.name LIKE ? ESCAPE '\\' ORDER BY a.id LIMIT ?"
+    ),
+    "email": (
+        "SELECT a.name, a.email, e.name FROM attendees a JOIN events e ON e.id = a.event_id "
+        "WHERE a.email LIKE ? ESCAPE '\\' ORDER BY a.id LIMIT ?"
+    ),
+}
+
+
+def _attendee(row) -> dict:
+    return {"id": row[0], "event_id": row[1], "name": row[2], "email": row[3]}
+
+
+class SqliteEventStore:
+    """
+    EventStore backed by a SQLite file, shareable across worker processes.
+
+    Same methods as the in-memory EventStore. The database runs in WAL mode
+    so readers in other processes never block on a writer. Writes are
+    grouped: they are committed once `batch_size` are pending, or
+    `max_delay` seconds after the first uncommitted one, or on flush().
+
+    The events table is small and read on every request, so it is cached
+    in memory and reloaded only when another connection has committed
+    (PRAGMA data_version changed).
+    """
+
+    def __init__(self, path, events=(), attendees=(), batch_size=32, max_delay=0.05):
+        self.path = path
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, cached_statements=128)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        had_counts = self._db.execute(HAS_COUNTS).fetchone() is not None
+        self._db.executescript(SCHEMA)
+        if not had_counts:
+            self._db.execute(BACKFILL_COUNTS)
+        try:
+            self._db.executescript(SEARCH_SCHEMA)
+            self._fts = True
+        except sqlite3.OperationalError:
+            self._fts = False
+        self._pending = 0
+        self._flush_timer = None
+        self._data_version = None
+        self.events_version = 0
+        self.events_tag = ""
+        self._events = []
+        self._events_by_name = {}
+        self._events_by_id = {}
+        self._events_context = ""
+
+        with self._lock:
+            self._reload_events()
+            if not self._events:
+                # Seed a fresh database only.
+                for event in events:
+                    self.add_event(event["name"], event["id"])
+                for attendee in attendees:
+                    self._write(INSERT_ATTENDEE, (attendee["id"], attendee["event_id"], attendee["name"], attendee["email"]))
+                self.flush()
+        # The flush timer is a daemon thread; don't lose its batch at exit.
+        atexit.register(self.flush)
+
+    @property
+    def events(self):
+        self._check_data_version()
+        return self._events
+
+    @property
+    def attendees(self):
+        with self._lock:
+            return [_attendee(row) for row in self._db.execute(SELECT_ATTENDEES)]
+
+    def count_attendees(self):
+        with self._lock:
+            return self._db.execute(COUNT_ATTENDEES).fetchone()[0]
+
+    def attendee_counts(self):
+        """Number of attendees per event id (every event, including empty ones)."""
+        with self._lock:
+            return dict(self._db.execute(SELECT_COUNTS).fetchall())
+
+    def add_event(self, name, event_id=None):
+        """Add an event; raises ValueError if its name (any case) or id is taken."""
+        with self._lock:
+            try:
+                cursor = self._write(INSERT_EVENT, (event_id, name))
+            except sqlite3.IntegrityError as exc:
+                raise ValueError(f"Event already exists: {name}") from exc
+            event = {"id": cursor.lastrowid if event_id is None else event_id, "name": name}
+            self._events.append(event)
+            self._index_events()
+            return event
+
+    def get_event(self, event_name):
+        self._check_data_version()
+        return self._events_by_name.get(event_name.casefold())
+
+    def get_event_by_id(self, event_id):
+        self._check_data_version()
+        return self._events_by_id.get(event_id)
+
+    def find_by_email(self, email):
+        """Exact (case-insensitive) email lookup across all events."""
+        with self._lock:
+            return [_attendee(row) for row in self._db.execute(SELECT_BY_EMAIL, (email,))]
+
+    def search_attendees(self, field, query, limit=None):
+        """
+        Case-insensitive substring search on attendee "name" or "email".
+
+        Returns up to `limit` dicts with name, email and the event name
+        already joined, in registration order.
+        """
+        if not query:
+            return []
+        limit = -1 if limit is None else limit
+        if self._fts and len(query) >= 3:
+            phrase = query.replace('"', '""')
+            sql, params = SEARCH_FTS, (f'{field} : "{phrase}"', limit)
+        else:
+            # Trigram MATCH needs at least three characters.
+            pattern = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            sql, params = SEARCH_LIKE[field], (pattern, limit)
+        with self._lock:
+            return [{"name": row[0], "email": row[1], "event": row[2]} for row in self._db.execute(sql, params)]
+
+    def list_attendees(self, event_name):
+        event = self.get_event(event_name)
+        if not event:
+            return []
+        with self._lock:
+            return [_attendee(row) for row in self._db.execute(SELECT_BY_EVENT, (event["id"],))]
+
+    def add_attendee(self, event_name, name, email):
+        event = self.get_event(event_name)
+        if not event:
+            return {"error": "Event not found"}
+        with self._lock:
+            cursor = self._write(INSERT_ATTENDEE, (None, event["id"], name, email))
+            return {"id": cursor.lastrowid, "event_id": event["id"], "name": name, "email": email}
+
+    def add_attendees(self, rows):
+        """
+        Register many {event_name, name, email} rows in one transaction.
+
+        Every row is validated before anything is written; valid rows are
+        committed together (or not at all) and invalid ones reported.
+        Returns {"batch": per-row results, "registered": n, "rejected": n}.
+        """
+        with self._lock:
+            results, accepted = check_registrations(self, rows)
+            self.flush()
+            self._db.execute("BEGIN")
+            try:
+                for i, event, name, email in accepted:
+                    cursor = self._db.execute(INSERT_ATTENDEE, (None, event["id"], name, email))
+                    results[i] = {"status": "registered", "id": cursor.lastrowid, "event_id": event["id"],
+                                  "name": name, "email": email}
+                self._db.execute("COMMIT")
+            except sqlite3.Error:
+                self._db.execute("ROLLBACK")
+                raise
+            self._data_version = self._current_data_version()
+        return batch_summary(results)
+
+    def remove_attendee(self, attendee_id):
+        """Unregister an attendee by id; returns the removed row, or an error."""
+        with self._lock:
+            row = self._db.execute(SELECT_ATTENDEE, (attendee_id,)).fetchone()
+            if row is None:
+                return {"error": "Attendee not found"}
+            self._write(DELETE_ATTENDEE, (attendee_id,))
+            return _attendee(row)
+
+    def events_context(self):
+        """Rendered events list, rebuilt only when events change (see events_version)."""
+        self._check_data_version()
+        return self._events_context
+
+    def flush(self):
+        """Commit any pending writes now."""
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if self._pending:
+                self._db.execute("COMMIT")
+                self._pending = 0
+                self._data_version = self._current_data_version()
+
+    def close(self):
+        self.flush()
+        atexit.unregister(self.flush)
+        self._db.close()
+
+    def _write(self, sql, params):
+        began = not self._pending
+        if began:
+            self._db.execute("BEGIN")
+        try:
+            cursor = self._db.execute(sql, params)
+        except sqlite3.Error:
+            # A failed statement leaves earlier pending writes in place; only
+            # a transaction opened for this one has to be closed again.
+            if began:
+                self._db.execute("ROLLBACK")
+            raise
+        self._pending += 1
+        if self._pending >= self.batch_size:
+            self.flush()
+        elif self._flush_timer is None:
+            self._flush_timer = threading.Timer(self.max_delay, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+        return cursor
+
+    def _current_data_version(self):
+        return self._db.execute("PRAGMA data_version").fetchone()[0]
+
+    def _check_data_version(self):
+        # data_version only moves when *another* connection commits.
+        with self._lock:
+            if self._current_data_version() != self._data_version:
+                self._reload_events()
+
+    def _reload_events(self):
+        events = [{"id": row[0], "name": row[1]} for row in self._db.execute(SELECT_EVENTS)]
+        self._data_version = self._current_data_version()
+        if events != self._events:
+            self._events = events
+            self._index_events()
+
+    def _index_events(self):
+        self._events_by_name = {e["name"].casefold(): e for e in self._events}
+        self._events_by_id = {e["id"]: e for e in self._events}
+        self.events_version += 1
+        self._events_context = "\n".join(f"{e['id']}: {e['name']}" for e in self._events)
+        self.events_tag = hashlib.sha1(self._events_context.encode()).hexdigest()[:12]
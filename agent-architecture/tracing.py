@@ -0,0 +1,269 @@
+"""
+Structured per-request tracing for the pipeline.
+
+`span(name, **attributes)` opens a span under the current one (tracked in a
+contextvar, so asyncio tasks inherit their parent). The outermost span is
+the request; when it ends, the whole trace is handed to every configured
+exporter:
+
+- JsonExporter: one JSON line per trace (TRACE_JSON_PATH)
+- OtlpExporter: OTLP/HTTP JSON to an OpenTelemetry collector
+  (OTEL_EXPORTER_OTLP_ENDPOINT or OTEL_EXPORTER_OTLP_TRACES_ENDPOINT)
+"""
+import contextvars
+import functools
+import inspect
+import json
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+exporters = []
+
+
+class Span:
+    def __init__(self, name: str, trace_id: str, parent_id, spans: list, attributes: dict, stage: str = None):
+        self.name = name
+        # Innermost enclosing "stage.*" span, e.g. "validate"; None outside stages.
+        self.stage = name[len("stage."):] if name.startswith("stage.") else stage
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.attributes = dict(attributes)
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self._spans = spans  # shared by every span of the trace
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": (self.end_ns - self.start_ns) / 1e6,
+            "attributes": self.attributes,
+        }
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Record a span around the block; the outermost span exports its trace on exit."""
+    parent = _current_span.get()
+    if parent is None:
+        current = Span(name, os.urandom(16).hex(), None, [], attributes)
+    else:
+        current = Span(name, parent.trace_id, parent.span_id, parent._spans, attributes, parent.stage)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as exc:
+        current.set(error=f"{type(exc).__name__}: {exc}")
+        raise
+    finally:
+        current.end_ns = time.time_ns()
+        current._spans.append(current)
+        _current_span.reset(token)
+        if parent is None:
+            _export(current)
+
+
+def traced(name: str):
+    """Decorator wrapping a sync or async function in span(name)."""
+    def decorate(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def current_span():
+    return _current_span.get()
+
+
+def current_stage():
+    """Name of the pipeline stage being run (the innermost "stage.*" span), or None."""
+    current = _current_span.get()
+    return current.stage if current is not None else None
+
+
+def record_span(name: str, start_ns: int, **attributes):
+    """
+    Record an already finished span under the current one.
+
+    For work that spans generator yields, where holding the contextvar open
+    would leak the span into the consumer's code.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        finished = Span(name, os.urandom(16).hex(), None, [], attributes)
+    else:
+        finished = Span(name, parent.trace_id, parent.span_id, parent._spans, attributes)
+    finished.start_ns = start_ns
+    finished.end_ns = time.time_ns()
+    finished._spans.append(finished)
+    if parent is None:
+        _export(finished)
+
+
+def usage_attributes(usage) -> dict:
+    """Token counts from a Responses API `usage` object, as span attributes."""
+    if usage is None:
+        return {}
+    details = getattr(usage, "input_tokens_details", None)
+    return {
+        "input_tokens": usage.input_tokens,
+        "output_tokens": usage.output_tokens,
+        "cached_tokens": getattr(details, "cached_tokens", 0) or 0,
+    }
+
+
+def record_usage(current: Span, usage):
+    """Copy token counts from a Responses API `usage` object onto the span."""
+    if current is not None:
+        current.set(**usage_attributes(usage))
+
+
+def _export(root: Span):
+    if not exporters:
+        return
+    trace = {"trace_id": root.trace_id, "spans": [s.to_dict() for s in root._spans]}
+    for exporter in exporters:
+        try:
+            exporter.export(trace)
+        except Exception:
+            # Tracing must never fail a request.
+            pass
+
+
+class JsonExporter:
+    """Append each finished trace as one JSON line to `path`."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, trace: dict):
+        line = json.dumps(trace, default=str) + "\n"
+        with self._lock, open(self.path, "a") as f:
+            f.write(line)
+
+
+class OtlpExporter:
+    """
+    Send traces to an OTLP/HTTP collector using the JSON encoding.
+
+    Traces are queued and posted in batches from a background thread, so
+    exporting never blocks the event loop.
+    """
+
+    def __init__(self, endpoint: str, service_name="event-assistant", batch_size=64, flush_interval=1.0):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def export(self, trace: dict):
+        self._queue.put(trace)
+
+    def shutdown(self):
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+    def _run(self):
+        # Post when the batch is full, the queue goes quiet, or on shutdown.
+        batch = []
+        stopping = False
+        while not stopping:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+                if item is None:
+                    stopping = True
+                else:
+                    batch.append(item)
+                    if len(batch) < self.batch_size:
+                        continue
+            except queue.Empty:
+                pass
+            if batch:
+                self._post(batch)
+                batch = []
+
+    def _post(self, traces: list):
+        import urllib.request  # only exporting processes pay for http.client
+        spans = [
+            _otlp_span(trace["trace_id"], s)
+            for trace in traces
+            for s in trace["spans"]
+        ]
+        payload = {
+            "resourceSpans": [{
+                "resource": {"attributes": [_otlp_attribute("service.name", self.service_name)]},
+                "scopeSpans": [{"scope": {"name": "agent-architecture.tracing"}, "spans": spans}],
+            }]
+        }
+        request = urllib.request.Request(
+            self.endpoint,
+            data=json.dumps(payload).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        try:
+            urllib.request.urlopen(request, timeout=5).close()
+        except OSError:
+            pass
+
+
+def _otlp_span(trace_id: str, s: dict) -> dict:
+    return {
+        "traceId": trace_id,
+        "spanId": s["span_id"],
+        "parentSpanId": s["parent_id"] or "",
+        "name": s["name"],
+        "kind": 1,
+        "startTimeUnixNano": str(s["start_ns"]),
+        "endTimeUnixNano": str(s["end_ns"]),
+        "attributes": [_otlp_attribute(k, v) for k, v in s["attributes"].items()],
+        "status": {"code": 2 if "error" in s["attributes"] else 1},
+    }
+
+
+def _otlp_attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def configure_from_env():
+    if os.getenv("TRACE_JSON_PATH"):
+        exporters.append(JsonExporter(os.environ["TRACE_JSON_PATH"]))
+    endpoint = os.getenv("OTEL_EXPORTER_OTLP_TRACES_ENDPOINT")
+    if not endpoint and os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT"):
+        endpoint = os.environ["OTEL_EXPORTER_OTLP_ENDPOINT"].rstrip("/") + "/v1/traces"
+    if endpoint:
+        exporters.append(OtlpExporter(endpoint))
+
+
+configure_from_env()
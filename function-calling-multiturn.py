@@ -1,10 +1,15 @@
 import os
 import json
-from dotenv import load_dotenv
-from openai import OpenAI
+from shared_client import client
+from conversation_memory import ConversationMemory, llm_summarizer
+from tool_engine import DEFAULT_PAGE_SIZE, ToolRegistry, paginate, result_sizes, run_tool_loop
 
-load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Token budget for the history sent on each turn (see conversation_memory.py).
+MEMORY_TOKEN_BUDGET = int(os.getenv("MEMORY_TOKEN_BUDGET", "1500"))
+MEMORY_KEEP_RECENT = int(os.getenv("MEMORY_KEEP_RECENT", "6"))
+MAX_TOOL_RESULT_TOKENS = int(os.getenv("MAX_TOOL_RESULT_TOKENS", "200"))
+# Model calls per user turn before the model must answer without tools.
+MAX_TOOL_ITERATIONS = int(os.getenv("MAX_TOOL_ITERATIONS", "5"))
 
 # ------------------------
 # Mock relational "tables"
@@ -23,13 +28,14 @@ ATTENDEES = [
 # ------------------------
 # Mock relational functions
 # ------------------------
-def list_attendees(event_id: int) -> list[dict]:
-    '''Get all attendees registered for a specific event.'''
+def list_attendees(event_id: int, cursor: str = None, limit: int = DEFAULT_PAGE_SIZE) -> dict:
+    '''Get one page of the attendees registered for a specific event.'''
     attendees = []
     for attendee in ATTENDEES:
         if attendee['event_id'] == event_id:
             attendees.append(attendee)
-    return attendees
+    # {"items": [...], "count": total, "next_cursor": ...}, never the whole table
+    return paginate(attendees, cursor, limit)
 
 def add_attendee(event_id: int, name: str, email: str) -> dict:
     '''Register a new attendee for an event.'''
@@ -44,10 +50,12 @@ def add_attendee(event_id: int, name: str, email: str) -> dict:
     }
     
     ATTENDEES.append(new_attendee)
+    # Only the inserted row and counts; list_attendees pages through the rest.
     return {
         'success': True,
         'attendee': new_attendee,
-        'all_attendees': ATTENDEES
+        'event_attendee_count': sum(1 for attendee in ATTENDEES if attendee['event_id'] == event_id),
+        'total_attendees': len(ATTENDEES)
     }
 
 def get_events() -> str:
@@ -58,37 +66,57 @@ def get_events() -> str:
         event_lines.append(event_line)
     return '\n'.join(event_lines)
 
+def get_tool_result(reference: str):
+    '''Return a tool result that the conversation memory truncated to a reference.'''
+    result = memory.lookup(reference)
+    return result if result is not None else {"error": "Unknown reference"}
+
 # ------------------------
-# Function schemas for AI
+# Tool registry (name -> function + schema for AI)
 # ------------------------
-tools = [
+registry = ToolRegistry()
+registry.register(
+    "list_attendees",
+    list_attendees,
+    "List all attendees for a given event",
     {
-        "type": "function",
-        "name": "list_attendees",
-        "description": "List all attendees for a given event",
-        "parameters": {
-            "type": "object",
-            "properties": {
-                "event_id": {"type": "integer", "description": "The ID of the event"},
-            },
-            "required": ["event_id"],
+        "type": "object",
+        "properties": {
+            "event_id": {"type": "integer", "description": "The ID of the event"},
+            "cursor": {"type": "string", "description": "next_cursor from the previous page, to get the next one"},
+            "limit": {"type": "integer", "description": "Maximum attendees to return"},
         },
+        "required": ["event_id"],
     },
+)
+registry.register(
+    "add_attendee",
+    add_attendee,
+    "Add a new attendee to an event",
     {
-        "type": "function",
-        "name": "add_attendee",
-        "description": "Add a new attendee to an event",
-        "parameters": {
-            "type": "object",
-            "properties": {
-                "event_id": {"type": "integer"},
-                "name": {"type": "string"},
-                "email": {"type": "string"},
-            },
-            "required": ["event_id", "name", "email"],
+        "type": "object",
+        "properties": {
+            "event_id": {"type": "integer"},
+            "name": {"type": "string"},
+            "email": {"type": "string"},
         },
+        "required": ["event_id", "name", "email"],
     },
-]
+    # Writes to ATTENDEES, so never runs alongside another add_attendee.
+    exclusive=True,
+)
+registry.register(
+    "get_tool_result",
+    get_tool_result,
+    "Fetch the full content of an earlier tool result that was truncated to a reference",
+    {
+        "type": "object",
+        "properties": {
+            "reference": {"type": "string", "description": "The reference, e.g. tool-result-1"},
+        },
+        "required": ["reference"],
+    },
+)
 
 # ------------------------
 # System message
@@ -105,7 +133,15 @@ system_message = {
 # ------------------------
 # Conversation state
 # ------------------------
-conversation = [system_message]
+# System message and recent turns are kept verbatim; older turns are folded
+# into a running summary once the history goes over MEMORY_TOKEN_BUDGET.
+memory = ConversationMemory(
+    system_message,
+    summarize=llm_summarizer(client),
+    budget_tokens=MEMORY_TOKEN_BUDGET,
+    keep_recent=MEMORY_KEEP_RECENT,
+    max_tool_result_tokens=MAX_TOOL_RESULT_TOKENS,
+)
 
 # ------------------------
 # Terminal I/O loop
@@ -116,41 +152,36 @@ while True:
     if user_input.strip().lower() == "exit":
         break
 
-    conversation.append({"role": "user", "content": user_input})
+    memory.add({"role": "user", "content": user_input})
 
-    response = client.responses.create(
+    # Runs all tool calls of each response in parallel and sends their results
+    # back as function_call_output items until the model gives its answer.
+    turn_result = run_tool_loop(
+        client,
+        registry,
+        memory.messages(),
+        max_iterations=MAX_TOOL_ITERATIONS,
         model="gpt-4.1",
-        input=conversation,
-        tools=tools,
     )
+    response = turn_result["response"]
+    turn = memory.record_turn(turn_result["input_tokens"])
+
+    for call, result in turn_result["calls"]:
+        print(f"\n[Tool Call] {call['name']}({call['arguments']}) -> {json.dumps(result, indent=2)}")
+        print(f"({len(json.dumps(result)):,} bytes; largest {call['name']} result so far "
+              f"{result_sizes[call['name']]['max_bytes']:,} bytes)")
+        # Tool results are kept in memory (large ones become a reference)
+        memory.add_tool_result(call, result)
 
     # Print assistant text
     print(f"\nAssistant: {response.output_text}")
-
-    # Handle any function calls
-    for item in response.output:
-        if item.type == 'function_call':
-            args = json.loads(item.arguments)
-            if item.name == 'list_attendees':
-                result = list_attendees(args['event_id'])
-                print(f"\n[Tool Call] {item.name}({args}) -> {json.dumps(result, indent=2)}")
-                print(f"Here are the attendees for the event:\n {json.dumps(result, indent=2)}")
-            elif item.name == 'add_attendee':
-                result = add_attendee(args['event_id'], args['name'], args['email'])
-                print(f"\n[Tool Call] {item.name}({args}) -> {json.dumps(result, indent=2)}")
-                print("That user is registered for the event!")
-
-            else:
-                result = {"error": "Unknown tool"}
-
-            # Print tool result
-
-            # Append tool result as assistant message
-            conversation.append({
-                "role": "assistant",
-                "content": f"[Tool Result] {json.dumps(result)}"
-            })
-        elif item.type == 'output_text':
-                print(f"\nAssistant: {item.content}")
-
+    if response.output_text:
+        memory.add({"role": "assistant", "content": response.output_text})
+
+    # Input tokens sent this turn vs. resending the full history
+    print(
+        f"\n[Memory] turn {turn['turn']}: ~{turn['sent_tokens']} input tokens sent "
+        f"(full history ~{turn['full_tokens']}, saved ~{turn['saved_tokens']}, {turn['saved_fraction']:.0%})"
+        + (f", API reported {turn['input_tokens']} over all tool rounds" if turn['input_tokens'] is not None else "")
+    )
     print("\n---")  
\ No newline at end of file
@@ -1,10 +1,6 @@
-import os
 import json
-from dotenv import load_dotenv
-from openai import OpenAI
-
-load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+from shared_client import client
+from tool_engine import DEFAULT_PAGE_SIZE, check_result_size, paginate
 
 # ------------------------
 # Mock relational "tables"
@@ -23,13 +19,14 @@ ATTENDEES = [
 # ------------------------
 # Mock relational functions
 # ------------------------
-def list_attendees(event_id: int) -> list[dict]:
-    '''Get all attendees registered for a specific event.'''
+def list_attendees(event_id: int, cursor: str = None, limit: int = DEFAULT_PAGE_SIZE) -> dict:
+    '''Get one page of the attendees registered for a specific event.'''
     attendees = []
     for attendee in ATTENDEES:
         if attendee['event_id'] == event_id:
             attendees.append(attendee)
-    return attendees
+    # {"items": [...], "count": total, "next_cursor": ...}, never the whole table
+    return paginate(attendees, cursor, limit)
 
 def add_attendee(event_id: int, name: str, email: str) -> dict:
     '''Register a new attendee for an event.'''
@@ -44,10 +41,12 @@ def add_attendee(event_id: int, name: str, email: str) -> dict:
     }
     
     ATTENDEES.append(new_attendee)
+    # Only the inserted row and counts; list_attendees pages through the rest.
     return {
         'success': True,
         'attendee': new_attendee,
-        'all_attendees': ATTENDEES
+        'event_attendee_count': sum(1 for attendee in ATTENDEES if attendee['event_id'] == event_id),
+        'total_attendees': len(ATTENDEES)
     }
 
 def get_events() -> str:
@@ -70,6 +69,8 @@ tools = [
             "type": "object",
             "properties": {
                 "event_id": {"type": "integer", "description": "The ID of the event"},
+                "cursor": {"type": "string", "description": "next_cursor from the previous page, to get the next one"},
+                "limit": {"type": "integer", "description": "Maximum attendees to return"},
             },
             "required": ["event_id"],
         },
@@ -138,10 +139,13 @@ for item in response.output:
         print(f"- {item.name}: {args}")
         
         if item.name == 'list_attendees':
-            result = list_attendees(args['event_id'])
-            print(f"  -> result: {json.dumps(result, indent=2)}")
+            result = list_attendees(args['event_id'], args.get('cursor'), args.get('limit', DEFAULT_PAGE_SIZE))
         elif item.name == 'add_attendee':
             result = add_attendee(args['event_id'], args['name'], args['email'])
-            print(f"  -> result: {json.dumps(result, indent=2)}")
+        else:
+            result = {"error": "Unknown tool"}
+        # Records the serialized size; results over MAX_TOOL_RESULT_BYTES become an error.
+        result, size = check_result_size(item.name, result)
+        print(f"  -> result ({size:,} bytes): {json.dumps(result, indent=2)}")
     elif item.type == 'output_text':
         print(f"  -> result: {item.content}")
\ No newline at end of file
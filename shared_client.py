@@ -0,0 +1,16 @@
+"""
+The OpenAI client shared by the scripts in this directory.
+
+Calls go through agent-architecture/client_manager.py, so every script uses
+one pooled connection and the same per-model rate limits instead of its own
+OpenAI() client. Importing this also puts agent-architecture/ on sys.path
+for the scripts that use its other modules.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "agent-architecture"))
+
+from client_manager import clients  # noqa: E402
+
+client = clients.rate_limited_client()
@@ -1,10 +1,5 @@
-import os
 import json
-from dotenv import load_dotenv
-from openai import OpenAI
-
-load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+from shared_client import client
 
 prompt = "Explain what AI is in one sentence."
 